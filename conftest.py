@@ -0,0 +1,9 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def thumbnails_in_thread(settings):
+    """Под pytest миниатюры режутся без фонового пула, как в
+    core.test_runner.
+    """
+    settings.THUMBNAIL_WORKERS = 0
@@ -0,0 +1,54 @@
+"""Пользователь запроса из кэша.
+
+AuthenticationMiddleware на каждом запросе загружает пользователя
+по id из сессии. ``CachedModelBackend`` кладёт загруженного
+пользователя в кэш на ``AUTH_USER_CACHE_TIMEOUT`` секунд, так что
+вместе с сессиями в кэше (``SESSION_ENGINE`` ``cached_db``) запрос
+не обращается к базе, пока view не попросит данных. Промах читает
+основную базу, а не реплику: отставшая копия жила бы в кэше весь
+таймаут.
+
+Сохранение и удаление пользователя (смена пароля, имени, вход,
+который обновляет ``last_login``) сбрасывают копию - сразу и ещё раз
+после фиксации транзакции: иначе параллельный запрос успел бы
+положить в кэш строку до фиксации на весь таймаут. Изменения через
+``QuerySet.update()`` сигналов не шлют и доходят через таймаут.
+Хэш пароля в копии свежий, поэтому после смены пароля прежние сессии
+закрываются так же, как без кэша. Копия хранит и сам хэш пароля:
+общий кэш должен быть доступен только серверу (см. settings_production).
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .routers import use_primary
+
+
+def _user_key(user_id):
+    return f'auth_user:{user_id}'
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend, который читает пользователя сессии из кэша."""
+
+    def get_user(self, user_id):
+        key = _user_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            # В кэш надолго кладётся только строка основной базы.
+            with use_primary():
+                user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+        return user
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def forget_user(sender, instance, **kwargs):
+    key = _user_key(instance.pk)
+    cache.delete(key)
+    transaction.on_commit(lambda: cache.delete(key))
@@ -0,0 +1,220 @@
+"""Двухуровневый кэш: LRU в памяти процесса перед общим кэшем.
+
+Общий уровень - любой настроенный бэкенд Django (``OPTIONS['SHARED']``,
+например FileBasedCache или memcached), его видят все процессы.
+Локальный уровень - LRU каждого процесса, ограниченный суммарным
+размером значений (``MAX_SIZE`` байт), с вытеснением самых давних.
+
+Согласованность держится на версионированных ключах: в память процесса
+попадают только ключи с префиксами из ``LOCAL_KEY_PREFIXES`` - страницы
+лент с поколением в ключе, карточки с версиями, ETag. Значение под
+таким ключом не меняется; новые данные приходят под новым ключом,
+потому что в общем кэше сменилось поколение или версия. Сами поколения,
+версии и счётчики меняются на месте и всегда читаются из общего кэша.
+Локальная копия живёт не дольше ``LOCAL_TIMEOUT`` секунд, чтобы
+удаление ключа в другом процессе рано или поздно дошло и сюда.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+
+class LocalLRU:
+    """LRU байтовых значений с пределом суммарного размера."""
+
+    def __init__(self, max_size, max_item_size):
+        self.max_size = max_size
+        self.max_item_size = max_item_size
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return None
+
+    def set(self, key, data, timeout):
+        if len(data) > self.max_item_size or timeout <= 0:
+            self.delete(key)
+            return
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+            self.entries[key] = (data, time.monotonic() + timeout)
+            self.size += len(data)
+            while self.size > self.max_size:
+                self._remove(next(iter(self.entries)))
+
+    def delete(self, key):
+        with self.lock:
+            if key in self.entries:
+                self._remove(key)
+
+    def _remove(self, key):
+        data, _ = self.entries.pop(key)
+        self.size -= len(data)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+class TwoTierCache(BaseCache):
+    """Бэкенд кэша: локальный LRU и общий кэш из ``OPTIONS['SHARED']``."""
+
+    def __init__(self, location, params):
+        options = params.get('OPTIONS', {})
+        self.shared_alias = options['SHARED']
+        self.local_prefixes = tuple(options.get('LOCAL_KEY_PREFIXES', ()))
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 300)
+        max_size = options.get('MAX_SIZE', 16 * 1024 * 1024)
+        self.local = LocalLRU(
+            max_size, options.get('MAX_ITEM_SIZE', max_size // 16)
+        )
+        params = {
+            key: value for key, value in params.items() if key != 'OPTIONS'
+        }
+        super().__init__(params)
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def _local_key(self, key, version):
+        if not key.startswith(self.local_prefixes):
+            return None
+        return self.make_key(key, version)
+
+    def _local_timeout(self, timeout):
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is None:
+            return self.local_timeout
+        return min(timeout - time.time(), self.local_timeout)
+
+    def _remember(self, local_key, value, timeout=DEFAULT_TIMEOUT):
+        self.local.set(
+            local_key,
+            pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+            self._local_timeout(timeout),
+        )
+
+    def get(self, key, default=None, version=None):
+        local_key = self._local_key(key, version)
+        if local_key is not None:
+            data = self.local.get(local_key)
+            if data is not None:
+                return pickle.loads(data)
+        value = self.shared.get(key, self, version=version)
+        if value is self:
+            return default
+        if local_key is not None:
+            self._remember(local_key, value)
+        return value
+
+    def get_shared(self, key, default=None, version=None):
+        """Значение из общего кэша в обход памяти процесса.
+
+        Для локальных ключей, которые всё же перезаписываются по
+        истечении срока (страницы ``core.decorators.cache_page``):
+        копия в памяти могла устареть, пока другой процесс пересчитал
+        значение.
+        """
+        local_key = self._local_key(key, version)
+        if local_key is not None:
+            self.local.delete(local_key)
+        return self.get(key, default, version)
+
+    def get_many(self, keys, version=None):
+        found = {}
+        missing = []
+        for key in keys:
+            local_key = self._local_key(key, version)
+            data = local_key and self.local.get(local_key)
+            if data is not None:
+                found[key] = pickle.loads(data)
+            else:
+                missing.append(key)
+        if missing:
+            values = self.shared.get_many(missing, version=version)
+            for key, value in values.items():
+                local_key = self._local_key(key, version)
+                if local_key is not None:
+                    self._remember(local_key, value)
+            found.update(values)
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        local_key = self._local_key(key, version)
+        if local_key is not None:
+            self._remember(local_key, value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version=version)
+        for key, value in data.items():
+            local_key = self._local_key(key, version)
+            if local_key is not None and key not in failed:
+                self._remember(local_key, value, timeout)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version=version)
+        local_key = self._local_key(key, version)
+        if added and local_key is not None:
+            self._remember(local_key, value, timeout)
+        return added
+
+    def delete(self, key, version=None):
+        local_key = self._local_key(key, version)
+        if local_key is not None:
+            self.local.delete(local_key)
+        self.shared.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            local_key = self._local_key(key, version)
+            if local_key is not None:
+                self.local.delete(local_key)
+        self.shared.delete_many(keys, version=version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        local_key = self._local_key(key, version)
+        if local_key is not None:
+            self.local.delete(local_key)
+        return self.shared.incr(key, delta, version=version)
+
+    def has_key(self, key, version=None):
+        local_key = self._local_key(key, version)
+        if local_key is not None and self.local.get(local_key) is not None:
+            return True
+        return self.shared.has_key(key, version=version)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
+
+    def stats(self):
+        """Попадания и промахи локального уровня и его размер в байтах."""
+        return {
+            'hits': self.local.hits,
+            'misses': self.local.misses,
+            'size': self.local.size,
+            'keys': len(self.local.entries),
+        }
@@ -0,0 +1,230 @@
+import hashlib
+import math
+import random
+import time
+from functools import wraps
+
+from django.core.cache import caches
+from django.utils.cache import (get_cache_key, get_conditional_response,
+                                learn_cache_key, patch_vary_headers)
+from django.utils.encoding import iri_to_uri
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+from .routers import is_pinned, use_primary
+
+# Как часто запрос без прежней копии проверяет, готова ли страница.
+LOCK_POLL_INTERVAL = 0.05
+
+
+def _is_cacheable(response):
+    if response.streaming or response.status_code != 200:
+        return False
+    cache_control = response.get('Cache-Control', '')
+    if 'private' in cache_control or 'no-store' in cache_control:
+        return False
+    # Ответ, который ставит cookie, относится к конкретному посетителю.
+    return not response.cookies
+
+
+def _fresh(entry, early_expiry):
+    """Запись ещё свежая (с вероятностным досрочным истечением).
+
+    Чем ближе срок и чем дольше пересчёт (``delta``), тем вероятнее,
+    что очередной запрос пересчитает запись заранее, пока остальные
+    получают её из кэша (XFetch).
+    """
+    _, expires, delta = entry
+    now = time.time()
+    if early_expiry:
+        now -= delta * early_expiry * math.log(1 - random.random())
+    return now < expires
+
+
+def _lookup(cache, cache_key, early_expiry):
+    """Запись страницы и признак того, что она свежая."""
+    entry = cache_key and cache.get(cache_key)
+    if entry and _fresh(entry, early_expiry):
+        return entry, True
+    if entry and hasattr(cache, 'get_shared'):
+        # Копия из памяти процесса (TwoTierCache) могла устареть: страницу
+        # уже пересчитал другой процесс, и общий кэш знает об этом.
+        entry = cache.get_shared(cache_key)
+    return entry, bool(entry) and _fresh(entry, early_expiry)
+
+
+def _personal(response):
+    # Общая копия становится страницей посетителя в HolesMiddleware.
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def _lock_key(request, prefix):
+    # Ключ страницы до первой записи неизвестен (get_cache_key вернёт
+    # None), поэтому блокировка - по префиксу и адресу запроса.
+    url = hashlib.md5(iri_to_uri(request.build_absolute_uri()).encode())
+    return f'cache_page_lock:{prefix}:{url.hexdigest()}'
+
+
+def _wait(cache, request, prefix, lock_key, lock_wait):
+    """Дождаться страницы, которую пересчитывает другой запрос.
+
+    Возвращает запись или None, если за ``lock_wait`` секунд страница
+    не появилась или блокировку сняли, не положив её в кэш.
+    """
+    for _ in range(math.ceil(lock_wait / LOCK_POLL_INTERVAL)):
+        time.sleep(LOCK_POLL_INTERVAL)
+        cache_key = get_cache_key(request, prefix, 'GET', cache=cache)
+        entry, fresh = _lookup(cache, cache_key, 0)
+        if fresh:
+            return entry
+        if not cache.get(lock_key):
+            break
+    return None
+
+
+def _render(view, request, args, kwargs, cache, prefix, timeout,
+            stale_timeout):
+    """Отрисовать страницу и положить её в кэш.
+
+    Запись хранит ответ, срок свежести и время пересчёта; в кэше она
+    лежит ещё ``stale_timeout`` секунд после срока.
+    """
+    started = time.monotonic()
+    # Страница живёт в кэше часами: собираем её по основной базе,
+    # а не по реплике, которая может отставать.
+    with use_primary():
+        response = view(request, *args, **kwargs)
+    if _is_cacheable(response):
+        entry = (
+            response, time.time() + timeout, time.monotonic() - started
+        )
+        cache_key = learn_cache_key(
+            request, response, timeout + stale_timeout, prefix, cache=cache,
+        )
+        cache.set(cache_key, entry, timeout + stale_timeout)
+    return response
+
+
+def cache_page(timeout, *, key_prefix='', cache_alias='default',
+               stale_timeout=None, lock_timeout=30, lock_wait=1.0,
+               early_expiry=0):
+    """Кэширует ответ view на стороне сервера.
+
+    В отличие от ``django.views.decorators.cache.cache_page``:
+    - ``key_prefix`` может быть функцией ``(request, *args, **kwargs)``,
+      так в ключ попадает поколение данных, и новая запись сразу
+      меняет ключ страницы;
+    - браузеру не отдаются ``Expires`` и ``max-age``: страница может
+      жить в кэше сервера часами, но клиент всегда спрашивает свежую;
+    - копия в кэше одна для всех посетителей, без Vary по Cookie:
+      всё, что зависит от посетителя, view выводит дырками
+      (``core.holes``), а сама view на посетителя не смотрит.
+      Клиенту ответ отдаётся с Vary: Cookie, ведь после заполнения
+      дырок страница у каждого своя;
+    - страницу пересчитывает один запрос: он берёт блокировку в кэше
+      на ``lock_timeout`` секунд. Остальные получают истёкшую запись
+      (она хранится ещё ``stale_timeout`` секунд, по умолчанию
+      столько же, сколько свежая), а если её нет - до ``lock_wait``
+      секунд ждут новую и только потом пересчитывают сами.
+      Посетитель, который только что писал, истёкшую запись
+      не получает;
+    - ``early_expiry`` (например, 1.0) включает вероятностный
+      пересчёт незадолго до истечения срока.
+
+    Истёкшая запись лежит под тем же ключом, что и свежая. Страница
+    прошлого поколения не отдаётся: в ней может быть уже удалённый
+    пост или комментарий.
+    """
+    if stale_timeout is None:
+        stale_timeout = timeout
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            cache = caches[cache_alias]
+            prefix = key_prefix
+            if callable(key_prefix):
+                prefix = key_prefix(request, *args, **kwargs)
+            cache_key = get_cache_key(request, prefix, 'GET', cache=cache)
+            entry, fresh = _lookup(cache, cache_key, early_expiry)
+            if fresh:
+                return _personal(entry[0])
+            lock_key = not is_pinned(request) and _lock_key(request, prefix)
+            if lock_key and not cache.add(lock_key, 1, lock_timeout):
+                entry = entry or _wait(
+                    cache, request, prefix, lock_key, lock_wait
+                )
+                if entry:
+                    return _personal(entry[0])
+                lock_key = None
+            try:
+                return _personal(_render(
+                    view, request, args, kwargs, cache, prefix, timeout,
+                    stale_timeout,
+                ))
+            finally:
+                if lock_key:
+                    cache.delete(lock_key)
+        return wrapper
+    return decorator
+
+
+def conditional_page(state, *, timeout=None, cache_alias='default'):
+    """Условный GET, который отвечает 304, не вызывая view.
+
+    ``state(request, *args, **kwargs)`` возвращает строку, которая
+    меняется вместе с данными ответа (например, поколения лент или
+    версии из кэша). Сильный ETag - хэш этой строки и адреса запроса.
+    View сама ставит ``Last-Modified``; декоратор запоминает его в кэше
+    под ETag, и повторный запрос с If-None-Match или If-Modified-Since
+    получает 304 без рендеринга и без запросов, которые делает view.
+    Если ``state`` вернул None, условный GET не применяется.
+
+    Состояние и ответ читаются из основной базы: версии в кэше меняются
+    вместе с ней, а ответ, собранный по отстающей реплике, получил бы
+    новый ETag, и клиенты получали бы на старые данные 304.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            with use_primary():
+                return _conditional(request, args, kwargs)
+
+        def _conditional(request, args, kwargs):
+            value = state(request, *args, **kwargs)
+            if value is None:
+                return view(request, *args, **kwargs)
+            etag = quote_etag(hashlib.sha1(
+                f'{value}|{request.get_full_path()}'.encode()
+            ).hexdigest())
+            cache = caches[cache_alias]
+            cache_key = f'conditional_page:{etag}'
+            # 0 в кэше - ответ без Last-Modified.
+            last_modified = cache.get(cache_key)
+            if last_modified is not None:
+                response = get_conditional_response(
+                    request, etag=etag, last_modified=last_modified or None
+                )
+                if response is not None:
+                    response['ETag'] = etag
+                    if last_modified:
+                        response['Last-Modified'] = http_date(last_modified)
+                    return response
+            response = view(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            response['ETag'] = etag
+            last_modified = parse_http_date_safe(
+                response.get('Last-Modified', '')
+            )
+            cache.set(cache_key, last_modified or 0, timeout)
+            return get_conditional_response(
+                request, etag=etag, last_modified=last_modified,
+                response=response,
+            )
+        return wrapper
+    return decorator
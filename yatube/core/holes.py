@@ -0,0 +1,59 @@
+"""Дырки в общих страницах: персональные фрагменты.
+
+Страница ленты в кэше одна на всех посетителей, вошедших и анонимных.
+Части, которые зависят от посетителя (меню в шапке, вкладки лент,
+кнопка подписки, ссылка на правку), шаблон выводит тегом
+``{% hole 'имя' аргументы %}``: на их месте в странице остаётся
+метка-комментарий. ``HolesMiddleware`` на каждом запросе заменяет метки
+фрагментами, которые рисуют функции, зарегистрированные через
+``@register('имя')``, - уже для текущего посетителя.
+
+Аргументы метки - строки в URL-кодировке, поэтому не ломают
+комментарий. Подделать метку текстом поста нельзя: шаблоны
+экранируют ``<``.
+"""
+import re
+from urllib.parse import quote, unquote
+
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+MARKER = b'<!--hole:'
+_pattern = re.compile(rb'<!--hole:(\w+)((?::[^:>]*)*)-->')
+_holes = {}
+
+
+def register(name):
+    """Зарегистрировать функцию ``(request, *args) -> str`` для дырки."""
+    def decorator(function):
+        _holes[name] = function
+        return function
+    return decorator
+
+
+def marker(name, *args):
+    """Метка дырки ``name`` с аргументами для вставки в страницу."""
+    if name not in _holes:
+        raise ValueError(f'Дырка {name!r} не зарегистрирована.')
+    return mark_safe('<!--hole:{}{}-->'.format(name, ''.join(
+        ':' + quote(str(arg), safe='') for arg in args
+    )))
+
+
+def fill(request, content):
+    """Заменить метки в байтах страницы фрагментами для посетителя."""
+    if MARKER not in content:
+        return content
+
+    def replace(match):
+        args = [
+            unquote(arg.decode()) for arg in match.group(2).split(b':')[1:]
+        ]
+        return _holes[match.group(1).decode()](request, *args).encode()
+    return _pattern.sub(replace, content)
+
+
+@register('user_nav')
+def user_nav(request):
+    """Пункты меню в шапке: вход и регистрация или ссылки пользователя."""
+    return render_to_string('includes/user_nav.html', request=request)
@@ -0,0 +1,58 @@
+import sqlite3
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+
+class Command(BaseCommand):
+    help = (
+        'Копирует основную базу SQLite в файлы реплик через backup API. '
+        'С --interval повторяет копирование, пока не остановят: так '
+        'локально работает чтение с реплик (DATABASE_REPLICAS).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--database', action='append', dest='databases',
+            help='Реплика (по умолчанию - все из DATABASE_REPLICAS).',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Секунд между копиями; 0 - скопировать один раз.',
+        )
+
+    def handle(self, *args, **options):
+        aliases = options['databases'] or settings.DATABASE_REPLICAS
+        if not aliases:
+            raise CommandError('Реплики не заданы: DATABASE_REPLICAS пуст.')
+        for alias in [DEFAULT_DB_ALIAS, *aliases]:
+            if alias not in settings.DATABASES:
+                raise CommandError(f'Нет базы {alias} в DATABASES.')
+            engine = settings.DATABASES[alias]['ENGINE']
+            if not engine.endswith('sqlite3'):
+                raise CommandError(f'{alias}: копирование только для SQLite.')
+        source = settings.DATABASES[DEFAULT_DB_ALIAS]['NAME']
+        while True:
+            for alias in aliases:
+                started = time.perf_counter()
+                self.copy(source, settings.DATABASES[alias]['NAME'])
+                self.stdout.write(
+                    f'{alias}: скопировано за '
+                    f'{time.perf_counter() - started:.2f} с'
+                )
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def copy(self, source, target):
+        # Backup копирует согласованный снимок, а читатели реплики
+        # видят либо прежнюю копию, либо новую, и не теряют соединения.
+        source_db = sqlite3.connect(source)
+        target_db = sqlite3.connect(target, timeout=30)
+        try:
+            source_db.backup(target_db)
+        finally:
+            target_db.close()
+            source_db.close()
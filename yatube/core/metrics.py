@@ -0,0 +1,194 @@
+"""Метрики запросов в формате Prometheus, без внешних зависимостей.
+
+Счётчики и гистограммы копятся в памяти процесса под блокировкой
+и отдаются view ``core.views.metrics`` текстом в формате экспозиции
+Prometheus 0.0.4. У каждого процесса-воркера свои значения: Prometheus
+собирает их с каждого процесса отдельно и складывает сам.
+
+Метка ``view`` - имя маршрута (``posts:index``), поэтому число рядов
+ограничено числом адресов сайта, а не числом разных путей.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+# Границы корзин гистограмм времени, в секундах.
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+METRICS = {
+    'yatube_requests_total': (
+        'counter', 'Число обработанных запросов.'),
+    'yatube_request_duration_seconds': (
+        'histogram', 'Время ответа view вместе с middleware.'),
+    'yatube_db_queries_total': (
+        'counter', 'Число запросов к базе.'),
+    'yatube_db_duration_seconds_total': (
+        'counter', 'Суммарное время запросов к базе.'),
+    'yatube_request_db_queries': (
+        'histogram', 'Число запросов к базе на один запрос к сайту.'),
+    'yatube_template_render_seconds': (
+        'histogram', 'Время отрисовки шаблонов на один запрос к сайту.'),
+}
+
+_lock = threading.Lock()
+_values = {}
+_local = threading.local()
+
+
+class Histogram:
+    """Гистограмма: число наблюдений в каждой корзине, сумма и количество."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+
+class RequestStats:
+    """То, что накопилось за один запрос к сайту."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.render_time = 0.0
+        self.render_depth = 0
+
+    def execute(self, execute, sql, params, many, context):
+        """Обёртка ``connection.execute_wrapper``: считает запросы."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+
+def current():
+    """Статистика текущего запроса или None вне запроса."""
+    return getattr(_local, 'stats', None)
+
+
+@contextmanager
+def collect():
+    """Копить статистику запроса, пока открыт контекст."""
+    _local.stats = RequestStats()
+    try:
+        yield _local.stats
+    finally:
+        _local.stats = None
+
+
+@contextmanager
+def rendering():
+    """Засечь время отрисовки шаблона.
+
+    Вложенные шаблоны (карточки, отрисованные внутри ленты) не
+    считаются второй раз: время берётся только у внешнего.
+    """
+    stats = current()
+    if stats is None:
+        yield
+        return
+    stats.render_depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.render_depth -= 1
+        if not stats.render_depth:
+            stats.render_time += time.perf_counter() - started
+
+
+def _labels(**labels):
+    return tuple(sorted(labels.items()))
+
+
+def record(view, method, status, duration, stats):
+    """Добавить в метрики один обработанный запрос."""
+    method = method if method in METHODS else 'other'
+    view_labels = _labels(view=view)
+    with _lock:
+        _inc('yatube_requests_total', _labels(
+            view=view, method=method, status=str(status)
+        ))
+        _inc('yatube_db_queries_total', view_labels, stats.queries)
+        _inc('yatube_db_duration_seconds_total', view_labels, stats.db_time)
+        _observe('yatube_request_duration_seconds', view_labels, duration,
+                 LATENCY_BUCKETS)
+        _observe('yatube_request_db_queries', view_labels, stats.queries,
+                 QUERY_BUCKETS)
+        _observe('yatube_template_render_seconds', view_labels,
+                 stats.render_time, LATENCY_BUCKETS)
+
+
+def _inc(name, labels, amount=1):
+    series = _values.setdefault(name, {})
+    series[labels] = series.get(labels, 0) + amount
+
+
+def _observe(name, labels, value, buckets):
+    series = _values.setdefault(name, {})
+    if labels not in series:
+        series[labels] = Histogram(buckets)
+    series[labels].observe(value)
+
+
+def reset():
+    with _lock:
+        _values.clear()
+
+
+def _escape(value):
+    return (
+        value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+    )
+
+
+def _series(name, labels, value):
+    if labels:
+        name += '{{{}}}'.format(','.join(
+            f'{key}="{_escape(str(label))}"' for key, label in labels
+        ))
+    return f'{name} {value!r}' if isinstance(value, float) else (
+        f'{name} {value}'
+    )
+
+
+def render():
+    """Все метрики процесса в текстовом формате Prometheus."""
+    lines = []
+    with _lock:
+        for name, (kind, help_text) in METRICS.items():
+            series = _values.get(name)
+            if not series:
+                continue
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            for labels, value in sorted(series.items()):
+                if kind != 'histogram':
+                    lines.append(_series(name, labels, value))
+                    continue
+                total = 0
+                for bound, count in zip(value.buckets, value.counts):
+                    total += count
+                    lines.append(_series(
+                        f'{name}_bucket', labels + (('le', bound),), total
+                    ))
+                lines.append(_series(
+                    f'{name}_bucket', labels + (('le', '+Inf'),), value.count
+                ))
+                lines.append(_series(f'{name}_sum', labels, value.sum))
+                lines.append(_series(f'{name}_count', labels, value.count))
+    return '\n'.join(lines) + '\n'
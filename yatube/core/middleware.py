@@ -0,0 +1,77 @@
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import holes, metrics, routers
+
+
+class MetricsMiddleware:
+    """Метрики каждого запроса: время ответа, запросы к базе и их время,
+    время отрисовки шаблонов. Подключается первой в MIDDLEWARE, чтобы
+    учесть работу остальных middleware.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        with metrics.collect() as stats, ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats.execute))
+            response = self.get_response(request)
+        match = getattr(request, 'resolver_match', None)
+        metrics.record(
+            match.view_name if match else 'unresolved',
+            request.method,
+            response.status_code,
+            time.perf_counter() - started,
+            stats,
+        )
+        return response
+
+
+class PrimaryPinningMiddleware:
+    """Читать основную базу тем, кто недавно писал.
+
+    Запрос с записью ставит cookie на ``DATABASE_PRIMARY_STICKY``
+    секунд; пока cookie жива, все запросы посетителя читают основную
+    базу и видят свой пост или комментарий, даже если реплика ещё не
+    догнала её.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with routers.request_routing(pinned=routers.is_pinned(request)):
+            response = self.get_response(request)
+            wrote = routers.wrote()
+        if wrote and settings.DATABASE_REPLICAS:
+            response.set_cookie(
+                routers.PIN_COOKIE, '1',
+                max_age=settings.DATABASE_PRIMARY_STICKY,
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+
+class HolesMiddleware:
+    """Заполняет дырки в HTML-страницах фрагментами для посетителя.
+
+    Стоит после AuthenticationMiddleware: фрагментам нужен
+    ``request.user``, а сессия и CSRF должны увидеть, что их читали.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if not response.streaming and response.get(
+            'Content-Type', ''
+        ).startswith('text/html'):
+            response.content = holes.fill(request, response.content)
+        return response
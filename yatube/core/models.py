@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, router, transaction
 
 
 class CreatedModel(models.Model):
@@ -12,3 +12,43 @@ class CreatedModel(models.Model):
     class Meta:
         # Это абстрактная модель:
         abstract = True
+
+
+class AtomicSaveModel(models.Model):
+    """Абстрактная модель. Сохраняет объект вместе с обработчиками
+    сигнала post_save в одной транзакции: денормализованные данные
+    меняются только вместе с самой записью."""
+
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(
+            type(self), instance=self
+        )
+        with transaction.atomic(using=using):
+            super().save(*args, **kwargs)
+
+    class Meta:
+        abstract = True
+
+
+class CountersModel(models.Model):
+    """Абстрактная модель. Поля ``counter_fields`` меняются только
+    атомарными UPDATE (``posts.counters``); сохранение существующего
+    объекта их не пишет, иначе затёрло бы значения, которые сдвинули
+    после его загрузки."""
+    counter_fields = ()
+
+    def save(self, *args, **kwargs):
+        if (
+            not self._state.adding and not args
+            and kwargs.get('update_fields') is None
+            and not kwargs.get('force_insert')
+        ):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in self.counter_fields
+            ]
+        super().save(*args, **kwargs)
+
+    class Meta:
+        abstract = True
@@ -0,0 +1,167 @@
+import json
+from datetime import datetime
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import InvalidPage, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+
+def _cursor_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f'{type(value).__name__} нельзя сохранить в курсоре')
+
+
+def _no_page_number():
+    raise InvalidPage(
+        'Страница по курсору не нумеруется: используйте next_cursor '
+        'и previous_cursor.'
+    )
+
+
+class CursorPaginator(Paginator):
+    """Постраничный вывод по ключу сортировки, без COUNT(*) и OFFSET.
+
+    Соседние страницы адресуются непрозрачными курсорами ``after`` и
+    ``before``, поэтому любая страница читается одним проходом по индексу,
+    как бы глубоко она ни лежала. Номера страниц (``?page=``) работают
+    как раньше, через обычный ``Paginator``.
+
+    Страница по курсору - обычный ``Page``, но без номера: соседей
+    знают ``next_cursor`` и ``previous_cursor`` (их находит лишняя
+    строка выборки), ``has_next()`` и ``has_previous()`` смотрят на них,
+    а методы номеров бросают ``InvalidPage``. Общее число записей
+    (``count``, ``num_pages``) у таких страниц неизвестно - None,
+    поэтому и ``repr()`` страницы не делает COUNT(*).
+    """
+    cursor_pages = False
+
+    def __init__(self, object_list, per_page, ordering=('-created', '-id')):
+        self.ordering = tuple(ordering)
+        super().__init__(object_list.order_by(*self.ordering), per_page)
+
+    @cached_property
+    def count(self):
+        if self.cursor_pages:
+            return None
+        return super().count
+
+    @cached_property
+    def num_pages(self):
+        if self.cursor_pages:
+            return None
+        return super().num_pages
+
+    @property
+    def fields(self):
+        return [name.lstrip('-') for name in self.ordering]
+
+    def encode_cursor(self, obj):
+        values = [getattr(obj, name) for name in self.fields]
+        raw = json.dumps(values, default=_cursor_default)
+        return urlsafe_base64_encode(raw.encode())
+
+    def decode_cursor(self, cursor):
+        """Вернуть значения ключа из курсора или None, если он испорчен."""
+        try:
+            values = json.loads(urlsafe_base64_decode(cursor))
+            if len(values) != len(self.ordering):
+                return None
+            return [
+                self._to_python(name, value)
+                for name, value in zip(self.fields, values)
+            ]
+        except (TypeError, ValueError, ValidationError):
+            return None
+
+    def _to_python(self, name, value):
+        try:
+            field = self.object_list.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Аннотация, а не поле модели: значение хранится как есть.
+            return value
+        return field.to_python(value)
+
+    def _seek(self, values, forward=True):
+        """Условие «строго после курсора» в порядке ``ordering``."""
+        condition = Q()
+        for position, name in enumerate(self.ordering):
+            descending = name.startswith('-')
+            lookup = 'lt' if descending == forward else 'gt'
+            equal = {
+                field: value for field, value
+                in zip(self.fields[:position], values[:position])
+            }
+            equal[f'{self.fields[position]}__{lookup}'] = values[position]
+            condition |= Q(**equal)
+        return condition
+
+    def get_cursor_page(self, after=None, before=None):
+        """
+        Вернуть страницу после курсора ``after`` или до курсора ``before``.
+        Без курсора (или с испорченным курсором) возвращается первая страница.
+        """
+        self.cursor_pages = True
+        if before:
+            values = self.decode_cursor(before)
+            if values is not None:
+                return self._page_before(values)
+        if after:
+            values = self.decode_cursor(after)
+            if values is not None:
+                return self._page_after(values, after)
+        return self._page_after(None, None)
+
+    def _page_after(self, values, cursor):
+        queryset = self.object_list
+        if values is not None:
+            queryset = queryset.filter(self._seek(values))
+        items = list(queryset[:self.per_page + 1])
+        has_next = len(items) > self.per_page
+        items = items[:self.per_page]
+        previous_cursor = None
+        if values is not None:
+            previous_cursor = self.encode_cursor(items[0]) if items else cursor
+        return self._cursor_page(
+            items,
+            self.encode_cursor(items[-1]) if has_next else None,
+            previous_cursor,
+        )
+
+    def _page_before(self, values):
+        queryset = self.object_list.filter(self._seek(values, forward=False))
+        items = list(queryset.reverse()[:self.per_page + 1])
+        if len(items) <= self.per_page:
+            # Дошли до начала ленты: отдаём полную первую страницу.
+            return self._page_after(None, None)
+        items = items[:self.per_page][::-1]
+        return self._cursor_page(
+            items,
+            self.encode_cursor(items[-1]),
+            self.encode_cursor(items[0]),
+        )
+
+    def _cursor_page(self, items, next_cursor, previous_cursor):
+        page = self._get_page(items, None, self)
+        page.next_cursor = next_cursor
+        page.previous_cursor = previous_cursor
+        page.has_next = lambda: next_cursor is not None
+        page.has_previous = lambda: previous_cursor is not None
+        for name in (
+            'next_page_number', 'previous_page_number',
+            'start_index', 'end_index',
+        ):
+            setattr(page, name, _no_page_number)
+        return page
+
+    def page(self, number):
+        page = super().page(number)
+        page.next_cursor = (
+            self.encode_cursor(page[-1]) if page.has_next() else None
+        )
+        page.previous_cursor = (
+            self.encode_cursor(page[0]) if page.has_previous() else None
+        )
+        return page
@@ -0,0 +1,95 @@
+"""Чтение с реплик, запись в основную базу.
+
+Запросы к моделям приложений из ``DATABASE_REPLICA_APPS`` во время
+обработки HTTP-запроса читаются с одной из реплик
+``DATABASE_REPLICAS`` (одна реплика на весь запрос, чтобы данные
+страницы были согласованы между собой). Запись всегда идёт в
+``default``.
+
+Реплика может отставать на время копирования (``sync_replicas``),
+поэтому посетитель, который только что что-то записал, читает
+основную базу: до конца запроса и ещё ``DATABASE_PRIMARY_STICKY``
+секунд по cookie (см. ``PrimaryPinningMiddleware``). Вне HTTP-запроса
+(команды, фоновые потоки миниатюр) всё читается из основной базы:
+импорт сразу читает то, что сам записал.
+
+Пока список реплик пуст, роутер ничего не меняет.
+"""
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+PIN_COOKIE = 'primary_pin'
+
+_local = threading.local()
+
+
+@contextmanager
+def request_routing(pinned=False):
+    """Маршрутизация одного HTTP-запроса; ``pinned`` - читать основную."""
+    replicas = settings.DATABASE_REPLICAS
+    _local.replica = (
+        random.choice(replicas) if replicas and not pinned else None
+    )
+    _local.wrote = False
+    try:
+        yield
+    finally:
+        _local.replica = None
+
+
+def is_pinned(request):
+    """Посетитель недавно писал и должен видеть свежие данные."""
+    return PIN_COOKIE in request.COOKIES
+
+
+def wrote():
+    """Была ли в текущем запросе запись."""
+    return getattr(_local, 'wrote', False)
+
+
+@contextmanager
+def use_primary():
+    """Читать основную базу внутри блока.
+
+    Нужно тому, что кладётся в общий кэш надолго: страница, собранная
+    по отстающей реплике, пережила бы смену поколения ленты.
+    """
+    replica = getattr(_local, 'replica', None)
+    _local.replica = None
+    try:
+        yield
+    finally:
+        _local.replica = replica
+
+
+def from_replica(instance):
+    """Объект прочитан с реплики и может быть устаревшим."""
+    return instance._state.db in settings.DATABASE_REPLICAS
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label not in settings.DATABASE_REPLICA_APPS:
+            return None
+        return getattr(_local, 'replica', None) or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # После записи запрос дочитывает всё из основной базы.
+        _local.replica = None
+        _local.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики - копии основной базы, связи между ними допустимы.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема реплик приходит вместе с копией основной базы.
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
@@ -0,0 +1,179 @@
+"""Журнал медленных запросов к базе с планом EXPLAIN QUERY PLAN.
+
+Включается настройкой ``SLOW_QUERY_THRESHOLD`` (секунды); пока она
+None, middleware отключается и запросы ничем не оборачиваются.
+Запрос дольше порога пишется строкой JSON в ротируемый журнал
+``SLOW_QUERY_LOG``: SQL, типы параметров, view и шаблон, из которых
+он пришёл, место в коде и план, снятый сразу на том же соединении.
+Значения параметров (ключи сессий, адреса, тексты) в журнал не
+попадают: EXPLAIN получает их только в памяти.
+Страница ``admin/slow-queries/`` показывает последние записи.
+"""
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import ExitStack
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DatabaseError, connections
+from django.utils import timezone
+
+PROJECT_DIR = settings.BASE_DIR + os.sep
+# Инфраструктура core (middleware, обёртки, паджинатор) не считается
+# источником запроса: ищется код приложения, который его вызвал.
+CORE_DIR = os.path.dirname(__file__) + os.sep
+DJANGO_DIR = os.path.dirname(sys.modules['django'].__file__) + os.sep
+
+_local = threading.local()
+_handlers = {}
+_handlers_lock = threading.Lock()
+
+
+def _logger():
+    """Логгер журнала с ротацией по размеру файла."""
+    path = settings.SLOW_QUERY_LOG
+    with _handlers_lock:
+        if path not in _handlers:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            handler = RotatingFileHandler(
+                path,
+                maxBytes=settings.SLOW_QUERY_LOG_SIZE,
+                backupCount=settings.SLOW_QUERY_LOG_BACKUPS,
+                encoding='utf-8',
+            )
+            logger = logging.getLogger(f'yatube.slow_queries.{path}')
+            logger.propagate = False
+            logger.setLevel(logging.INFO)
+            logger.addHandler(handler)
+            _handlers[path] = logger
+        return _handlers[path]
+
+
+def _origin():
+    """Шаблон и строка кода проекта, откуда пришёл запрос."""
+    template = origin = None
+    frame = sys._getframe(1)
+    while frame and not (template and origin):
+        filename = frame.f_code.co_filename
+        if (
+            template is None and filename.startswith(DJANGO_DIR)
+            and frame.f_code.co_name == 'render'
+            and 'template' in filename
+        ):
+            node = frame.f_locals.get('self')
+            name = getattr(getattr(node, 'origin', None), 'template_name', '')
+            template = name or None
+        elif (
+            origin is None and filename.startswith(PROJECT_DIR)
+            and not filename.startswith(CORE_DIR)
+        ):
+            origin = f'{filename[len(PROJECT_DIR):]}:{frame.f_lineno}'
+        frame = frame.f_back
+    return template, origin
+
+
+def redact(params):
+    """Типы параметров запроса вместо значений."""
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {name: type(value).__name__ for name, value in params.items()}
+    return [type(value).__name__ for value in params]
+
+
+def explain(connection, sql, params):
+    """План запроса, снятый на том же соединении."""
+    if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+        return []
+    prefix = (
+        'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    )
+    _local.explaining = True
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(prefix + sql, params)
+            return [' '.join(map(str, row)) for row in cursor.fetchall()]
+    except DatabaseError as error:
+        return [f'EXPLAIN не удался: {error}']
+    finally:
+        _local.explaining = False
+
+
+class SlowQueryLogger:
+    """Обёртка ``connection.execute_wrapper`` для одного запроса к сайту."""
+
+    def __init__(self, request, threshold):
+        self.request = request
+        self.threshold = threshold
+
+    def __call__(self, execute, sql, params, many, context):
+        if getattr(_local, 'explaining', False):
+            return execute(sql, params, many, context)
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            if duration >= self.threshold:
+                self.log(context['connection'], sql, params, many, duration)
+
+    def log(self, connection, sql, params, many, duration):
+        match = getattr(self.request, 'resolver_match', None)
+        template, origin = _origin()
+        record = {
+            'time': timezone.now().isoformat(),
+            'duration_ms': round(duration * 1000, 3),
+            'database': connection.alias,
+            'sql': sql,
+            'params': None if many else redact(params),
+            'view': match.view_name if match else None,
+            'path': self.request.get_full_path(),
+            'template': template,
+            'origin': origin,
+            'plan': [] if many else explain(connection, sql, params),
+        }
+        _logger().info(json.dumps(record, ensure_ascii=False, default=str))
+
+
+class SlowQueryMiddleware:
+    """Пишет в журнал запросы к базе дольше ``SLOW_QUERY_THRESHOLD``."""
+
+    def __init__(self, get_response):
+        if settings.SLOW_QUERY_THRESHOLD is None:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        wrapper = SlowQueryLogger(request, settings.SLOW_QUERY_THRESHOLD)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(wrapper))
+            return self.get_response(request)
+
+
+def read_records(limit=200):
+    """Последние записи журнала, самые новые первыми."""
+    path = settings.SLOW_QUERY_LOG
+    records = []
+    paths = [path] + [
+        f'{path}.{number}'
+        for number in range(1, settings.SLOW_QUERY_LOG_BACKUPS + 1)
+    ]
+    for name in paths:
+        if not os.path.exists(name):
+            break
+        with open(name, encoding='utf-8') as file:
+            lines = file.readlines()
+        for line in reversed(lines):
+            try:
+                records.append(json.loads(line))
+            except ValueError:
+                continue
+            if len(records) >= limit:
+                return records
+    return records
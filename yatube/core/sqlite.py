@@ -0,0 +1,24 @@
+"""Настройка соединений SQLite при подключении.
+
+PRAGMA synchronous, cache_size и mmap_size действуют только на одно
+соединение, поэтому ставятся по сигналу ``connection_created`` для
+каждого нового соединения; с ``CONN_MAX_AGE`` это происходит раз на
+поток, а не на каждый запрос. journal_mode=WAL сохраняется в самом
+файле базы, но повторная установка ничего не стоит. Список берётся из
+настройки ``SQLITE_PRAGMAS``; пустой словарь - настройки SQLite по
+умолчанию.
+"""
+from django.conf import settings
+
+
+def pragma_statements(pragmas):
+    return [f'PRAGMA {name} = {value}' for name, value in pragmas.items()]
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', None)
+    if connection.vendor != 'sqlite' or not pragmas:
+        return
+    with connection.cursor() as cursor:
+        for statement in pragma_statements(pragmas):
+            cursor.execute(statement)
@@ -0,0 +1,11 @@
+from django import template
+
+from core import holes
+
+register = template.Library()
+
+
+@register.simple_tag
+def hole(name, *args):
+    """Метка персонального фрагмента, который заполнит HolesMiddleware."""
+    return holes.marker(name, *args)
@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    """Тесты режут миниатюры в том же потоке, без фонового пула.
+
+    Фоновые потоки гонялись бы с удалением временного MEDIA_ROOT.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.THUMBNAIL_WORKERS = 0
@@ -1,6 +1,28 @@
+import importlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
 from http import HTTPStatus
+from unittest import mock
 
-from django.test import TestCase
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.db import connection, router, transaction
+from django.http import HttpResponse
+from django.test import (RequestFactory, TestCase, TransactionTestCase,
+                         override_settings)
+from posts.models import Post
+
+from . import metrics, routers, slow_queries
+from .auth import CachedModelBackend
+from .cache import TwoTierCache
+from .decorators import _fresh, cache_page, conditional_page
+from .middleware import PrimaryPinningMiddleware
+from .sqlite import apply_pragmas
 
 
 class ViewTestClass(TestCase):
@@ -8,3 +30,504 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+@override_settings(METRICS_TOKEN='metrics-token')
+class MetricsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+
+    def metric(self, text, line):
+        for row in text.splitlines():
+            if row.startswith(line + ' '):
+                return float(row.rsplit(' ', 1)[1])
+        self.fail(f'Нет метрики {line}')
+
+    def test_metrics_per_view(self):
+        """Запросы, база и шаблоны учитываются по имени маршрута."""
+        self.client.get('/')
+        self.client.get('/')
+        text = self.client.get(
+            '/metrics/', HTTP_AUTHORIZATION='Bearer metrics-token'
+        ).content.decode()
+        self.assertEqual(self.metric(text, 'yatube_requests_total{'
+                         'method="GET",status="200",view="posts:index"}'), 2)
+        self.assertEqual(self.metric(
+            text, 'yatube_request_duration_seconds_count'
+                  '{view="posts:index"}'), 2)
+        self.assertGreater(self.metric(
+            text, 'yatube_db_queries_total{view="posts:index"}'), 0)
+        self.assertGreater(self.metric(
+            text, 'yatube_template_render_seconds_sum'
+                  '{view="posts:index"}'), 0)
+        self.assertIn(
+            'yatube_request_duration_seconds_bucket'
+            '{view="posts:index",le="+Inf"} 2', text)
+
+    def test_metrics_need_token_or_staff(self):
+        """Без токена метрики не видны даже с адреса прокси."""
+        for authorization in ('', 'Bearer wrong', 'metrics-token'):
+            with self.subTest(authorization=authorization):
+                response = self.client.get(
+                    '/metrics/', REMOTE_ADDR='127.0.0.1',
+                    HTTP_AUTHORIZATION=authorization,
+                )
+                self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        staff = get_user_model().objects.create_user(
+            username='staff', is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(
+            self.client.get('/metrics/').status_code, HTTPStatus.OK)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_empty_token_never_matches(self):
+        """Пустой токен не открывает метрики пустым заголовком."""
+        response = self.client.get(
+            '/metrics/', HTTP_AUTHORIZATION='Bearer ')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+
+class SlowQueryLogTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.directory = tempfile.mkdtemp()
+        self.log = os.path.join(self.directory, 'slow.log')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_disabled_by_default(self):
+        """Без порога журнал не пишется."""
+        with self.settings(SLOW_QUERY_LOG=self.log):
+            self.client.get('/')
+        self.assertFalse(os.path.exists(self.log))
+
+    def test_records_with_plan(self):
+        """Запрос дольше порога пишется с view, шаблоном и планом."""
+        User = get_user_model()
+        admin = User.objects.create_superuser('admin', 'a@a.ru', 'pass')
+        with self.settings(SLOW_QUERY_THRESHOLD=0, SLOW_QUERY_LOG=self.log):
+            self.client.get('/')
+            records = slow_queries.read_records()
+            self.assertTrue(records)
+            feed = [
+                record for record in records
+                if 'posts_post' in record['sql']
+            ][0]
+            self.assertEqual(feed['view'], 'posts:index')
+            self.assertEqual(feed['path'], '/')
+            self.assertTrue(feed['plan'])
+            self.assertTrue(feed['origin'])
+            self.client.force_login(admin)
+            response = self.client.get('/admin/slow-queries/')
+            self.assertContains(response, 'posts:index')
+
+    def test_params_redacted(self):
+        """В журнал попадают типы параметров, а не значения."""
+        User = get_user_model()
+        User.objects.create_user(username='secret-name')
+        with self.settings(SLOW_QUERY_THRESHOLD=0, SLOW_QUERY_LOG=self.log):
+            self.client.get('/profile/secret-name/')
+            records = slow_queries.read_records()
+        lookup = [
+            record for record in records
+            if '"username" = %s' in record['sql']
+        ][0]
+        self.assertEqual(lookup['params'], ['str'])
+        self.assertTrue(lookup['plan'])
+        for record in records:
+            self.assertNotIn('secret-name', json.dumps(record['params']))
+
+    def test_admin_page_staff_only(self):
+        """Страница журнала доступна только сотрудникам."""
+        response = self.client.get('/admin/slow-queries/')
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+
+class SqlitePragmaTests(TestCase):
+
+    def test_pragmas_on_connect(self):
+        """PRAGMA из SQLITE_PRAGMAS ставятся на новое соединение."""
+        with self.settings(SQLITE_PRAGMAS={'cache_size': -1234}):
+            apply_pragmas(sender=None, connection=connection)
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone()[0], -1234)
+
+    def _import_production(self, environ):
+        sys.modules.pop('yatube.settings_production', None)
+        with mock.patch.dict(os.environ, environ, clear=True):
+            try:
+                return importlib.import_module('yatube.settings_production')
+            finally:
+                sys.modules.pop('yatube.settings_production', None)
+
+    def test_production_profile(self):
+        """Боевой профиль включает WAL и постоянные соединения."""
+        settings_production = self._import_production(
+            {'DJANGO_SECRET_KEY': 'production-key'})
+        self.assertFalse(settings_production.DEBUG)
+        self.assertEqual(settings_production.SECRET_KEY, 'production-key')
+        self.assertEqual(
+            settings_production.SQLITE_PRAGMAS['journal_mode'], 'WAL')
+        self.assertGreater(
+            settings_production.DATABASES['default']['CONN_MAX_AGE'], 0)
+
+    def test_production_requires_secret_key(self):
+        """Без DJANGO_SECRET_KEY боевые настройки не загружаются."""
+        with self.assertRaises(KeyError):
+            self._import_production({})
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTests(TestCase):
+
+    def test_reads_go_to_replica_in_request(self):
+        """В запросе посты и пользователи читаются с реплики."""
+        self.assertEqual(Post.objects.all().db, 'default')
+        with routers.request_routing():
+            self.assertEqual(Post.objects.all().db, 'replica')
+            self.assertEqual(
+                router.db_for_read(get_user_model()), 'replica')
+            self.assertEqual(get_user_model().objects.all().db, 'replica')
+            with routers.use_primary():
+                self.assertEqual(Post.objects.all().db, 'default')
+            self.assertEqual(Post.objects.all().db, 'replica')
+        self.assertEqual(Post.objects.all().db, 'default')
+
+    def test_reads_after_write_use_primary(self):
+        """После записи и по cookie запрос читает основную базу."""
+        with routers.request_routing():
+            self.assertEqual(Post.objects.all().db, 'replica')
+            self.assertEqual(router.db_for_write(Post), 'default')
+            self.assertEqual(Post.objects.all().db, 'default')
+            self.assertTrue(routers.wrote())
+        with routers.request_routing(pinned=True):
+            self.assertEqual(Post.objects.all().db, 'default')
+
+    def test_middleware_pins_writer(self):
+        """Запрос с записью ставит cookie, которая закрепляет основную базу."""
+        def view(request):
+            response = HttpResponse(Post.objects.all().db)
+            if request.method == 'POST':
+                router.db_for_write(Post)
+            return response
+
+        middleware = PrimaryPinningMiddleware(view)
+        factory = RequestFactory()
+        response = middleware(factory.get('/'))
+        self.assertEqual(response.content, b'replica')
+        self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+        response = middleware(factory.post('/'))
+        self.assertEqual(
+            response.cookies[routers.PIN_COOKIE]['max-age'],
+            settings.DATABASE_PRIMARY_STICKY)
+        request = factory.get('/')
+        request.COOKIES[routers.PIN_COOKIE] = '1'
+        self.assertEqual(middleware(request).content, b'default')
+
+    def test_pinned_request_reads_primary(self):
+        """Запрос с cookie читает основную базу и не продлевает cookie
+        без записи.
+        """
+        User = get_user_model()
+
+        def view(request):
+            return HttpResponse(
+                f'{Post.objects.all().db} {User.objects.all().db}')
+
+        request = RequestFactory().get('/')
+        request.COOKIES[routers.PIN_COOKIE] = '1'
+        response = PrimaryPinningMiddleware(view)(request)
+        self.assertEqual(response.content, b'default default')
+        self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_no_pin_without_replicas(self):
+        """Без реплик запись не ставит cookie."""
+        def view(request):
+            router.db_for_write(Post)
+            return HttpResponse()
+
+        response = PrimaryPinningMiddleware(view)(RequestFactory().post('/'))
+        self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+
+    def test_cached_user_read_from_primary(self):
+        """Пользователь сессии в кэш берётся из основной базы."""
+        user = get_user_model().objects.create_user(username='reader')
+        cache.clear()
+        with routers.request_routing():
+            cached = CachedModelBackend().get_user(user.pk)
+        self.assertEqual(cached._state.db, 'default')
+
+    def test_cached_pages_built_from_primary(self):
+        """Страницы для общего кэша собираются по основной базе."""
+        @cache_page(60)
+        def view(request):
+            return HttpResponse(Post.objects.all().db)
+
+        cache.clear()
+        with routers.request_routing():
+            response = view(RequestFactory().get('/'))
+        self.assertEqual(response.content, b'default')
+
+    def test_conditional_pages_built_from_primary(self):
+        """Ответ с ETag собирается по той же базе, что и его состояние."""
+        databases = []
+
+        def state(request):
+            databases.append(Post.objects.all().db)
+            return 'state'
+
+        @conditional_page(state)
+        def view(request):
+            return HttpResponse(Post.objects.all().db)
+
+        cache.clear()
+        with routers.request_routing():
+            response = view(RequestFactory().get('/'))
+            self.assertEqual(Post.objects.all().db, 'replica')
+        self.assertEqual(response.content, b'default')
+        self.assertEqual(databases, ['default'])
+
+
+class StampedeTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.generation = 1
+        self.calls = []
+        self.nested = None
+
+        @cache_page(
+            60, key_prefix=lambda request: f'page.{self.generation}'
+        )
+        def view(request):
+            self.calls.append(self.generation)
+            if self.nested:
+                self.nested = self.nested(request)
+            return HttpResponse(
+                f'поколение {self.generation}, пересчёт {len(self.calls)}'
+            )
+
+        self.view = view
+        self.factory = RequestFactory()
+
+    def expired(self):
+        return mock.patch(
+            'core.decorators.time.time', return_value=time.time() + 61
+        )
+
+    def test_one_request_recomputes(self):
+        """Пока страница пересчитывается, остальные получают истёкшую."""
+        self.view(self.factory.get('/'))
+        self.nested = self.view
+        with self.expired():
+            response = self.view(self.factory.get('/'))
+            self.assertEqual(
+                response.content.decode(), 'поколение 1, пересчёт 2')
+            self.assertEqual(
+                self.nested.content.decode(), 'поколение 1, пересчёт 1')
+            self.nested = None
+            response = self.view(self.factory.get('/'))
+        self.assertEqual(response.content.decode(), 'поколение 1, пересчёт 2')
+        self.assertEqual(self.calls, [1, 1])
+
+    def test_cold_miss_waits_for_recompute(self):
+        """Без истёкшей записи остальные ждут страницу, которую
+        пересчитывает первый запрос.
+        """
+        def other_request(seconds):
+            self.view(self.factory.get('/'))
+
+        with mock.patch.object(cache, 'add', side_effect=[False, True]), \
+                mock.patch('core.decorators.time.sleep',
+                           side_effect=other_request) as sleep:
+            response = self.view(self.factory.get('/'))
+        self.assertEqual(response.content.decode(), 'поколение 1, пересчёт 1')
+        self.assertEqual(self.calls, [1])
+        sleep.assert_called_once()
+
+    def test_previous_generation_not_served(self):
+        """После смены поколения прежняя страница не отдаётся: запрос
+        ждёт новую и, не дождавшись, пересчитывает её сам.
+        """
+        def other_request(request):
+            self.nested = None
+            return self.view(self.factory.get('/'))
+
+        self.view(self.factory.get('/'))
+        self.generation = 2
+        self.nested = other_request
+        with mock.patch('core.decorators.time.sleep'):
+            self.view(self.factory.get('/'))
+        self.assertEqual(
+            self.nested.content.decode(), 'поколение 2, пересчёт 3')
+        self.assertEqual(self.calls, [1, 2, 2])
+
+    def test_pinned_request_skips_stale_copy(self):
+        """Посетитель, который только что писал, ждёт свежую страницу."""
+        def pinned(request):
+            self.nested = None
+            request = self.factory.get('/')
+            request.COOKIES[routers.PIN_COOKIE] = '1'
+            return self.view(request)
+
+        self.view(self.factory.get('/'))
+        self.nested = pinned
+        with self.expired():
+            self.view(self.factory.get('/'))
+        self.assertEqual(
+            self.nested.content.decode(), 'поколение 1, пересчёт 3')
+        self.assertEqual(self.calls, [1, 1, 1])
+
+    def test_early_expiry(self):
+        """Досрочное истечение срабатывает тем раньше, чем дольше
+        пересчёт.
+        """
+        now = time.time()
+        with mock.patch('core.decorators.random.random', return_value=0.5):
+            self.assertTrue(_fresh(('', now + 60, 0.1), 0))
+            self.assertTrue(_fresh(('', now + 60, 0.1), 1.0))
+            self.assertFalse(_fresh(('', now + 60, 1000), 1.0))
+            self.assertFalse(_fresh(('', now - 1, 0), 0))
+
+
+@override_settings(CACHES={
+    **settings.CACHES, 'other': settings.CACHES['default'],
+})
+class StampedeTwoTierTests(TestCase):
+    # 'default' и 'other' - два процесса с общим кэшем 'shared'.
+
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+        def view(request):
+            self.calls += 1
+            return HttpResponse('страница')
+
+        self.views = [
+            cache_page(60, key_prefix='feed:test', cache_alias=alias)(view)
+            for alias in ('default', 'other')
+        ]
+
+    def test_page_recomputed_once_for_all_processes(self):
+        """Истёкшую страницу пересчитывает один процесс, второй берёт
+        новую из общего кэша, а не из устаревшей памяти.
+        """
+        for view in self.views:
+            view(RequestFactory().get('/'))
+        self.assertEqual(self.calls, 1)
+        later = time.time() + 61
+        with mock.patch('core.decorators.time.time', return_value=later):
+            for view in self.views:
+                view(RequestFactory().get('/'))
+        self.assertEqual(self.calls, 2)
+
+
+class TwoTierCacheTests(TestCase):
+
+    def setUp(self):
+        caches['shared'].clear()
+        self.cache = TwoTierCache('', {'OPTIONS': {
+            'SHARED': 'shared',
+            'LOCAL_KEY_PREFIXES': ['page:'],
+            'MAX_SIZE': 2000,
+            'MAX_ITEM_SIZE': 1000,
+        }})
+
+    def test_versioned_keys_served_from_memory(self):
+        """Неизменяемые ключи читаются из памяти, изменяемые - из общего
+        кэша.
+        """
+        self.cache.set('page:1', 'страница')
+        self.cache.set('generation', 1)
+        caches['shared'].delete('page:1')
+        caches['shared'].set('generation', 2)
+        self.assertEqual(self.cache.get('page:1'), 'страница')
+        self.assertEqual(self.cache.get('generation'), 2)
+        self.assertEqual(
+            self.cache.get_many(['page:1', 'generation']),
+            {'page:1': 'страница', 'generation': 2})
+        self.cache.delete('page:1')
+        self.assertIsNone(self.cache.get('page:1'))
+
+    def test_shared_values_fill_memory(self):
+        """Промах в памяти достаёт значение из общего кэша и запоминает."""
+        caches['shared'].set('page:2', 'из общего')
+        self.assertEqual(self.cache.get('page:2'), 'из общего')
+        caches['shared'].delete('page:2')
+        self.assertEqual(self.cache.get('page:2'), 'из общего')
+
+    def test_size_eviction(self):
+        """Память ограничена размером: вытесняются самые давние ключи."""
+        for number in range(5):
+            self.cache.set(f'page:{number}', 'x' * 500)
+            self.cache.get('page:0')
+        self.assertLessEqual(self.cache.local.size, 2000)
+        caches['shared'].clear()
+        self.assertIsNotNone(self.cache.get('page:0'))
+        self.assertIsNone(self.cache.get('page:1'))
+        self.assertIsNotNone(self.cache.get('page:4'))
+        self.cache.set('page:big', 'x' * 2000)
+        self.assertNotIn(
+            self.cache.make_key('page:big'), self.cache.local.entries)
+
+    def test_hot_index_page_in_memory(self):
+        """Повторные запросы главной берут страницу из памяти процесса."""
+        cache.clear()
+        self.client.get('/')
+        hits = cache.stats()['hits']
+        self.client.get('/')
+        self.assertGreater(cache.stats()['hits'], hits)
+
+
+@override_settings(AUTHENTICATION_BACKENDS=['core.auth.CachedModelBackend'])
+class CachedUserTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            username='Cached', password='old-password')
+        self.client.force_login(self.user)
+        self.backend = CachedModelBackend()
+
+    def test_user_read_from_cache(self):
+        """Пользователь сессии читается из базы один раз."""
+        self.backend.get_user(self.user.pk)
+        with self.assertNumQueries(0):
+            user = self.backend.get_user(self.user.pk)
+        self.assertEqual(user.username, 'Cached')
+
+    def test_changes_reset_cache(self):
+        """Смена имени видна сразу, смена пароля закрывает сессии."""
+        self.backend.get_user(self.user.pk)
+        self.user.first_name = 'Новое имя'
+        self.user.save()
+        self.assertEqual(
+            self.backend.get_user(self.user.pk).first_name, 'Новое имя')
+        self.assertTrue(
+            self.client.get('/').wsgi_request.user.is_authenticated)
+        self.user.set_password('new-password')
+        self.user.save()
+        self.assertFalse(
+            self.client.get('/').wsgi_request.user.is_authenticated)
+
+
+@override_settings(AUTHENTICATION_BACKENDS=['core.auth.CachedModelBackend'])
+class CachedUserCommitTests(TransactionTestCase):
+
+    def test_user_cached_before_commit_is_dropped(self):
+        """Копия, прочитанная до фиксации правки, после неё сброшена."""
+        user = get_user_model().objects.create_user(username='Cached')
+        backend = CachedModelBackend()
+        with transaction.atomic():
+            user.is_active = False
+            user.save()
+            # Параллельный запрос кладёт пользователя в кэш.
+            cache.set(f'auth_user:{user.pk}', user)
+        self.assertIsNone(backend.get_user(user.pk))
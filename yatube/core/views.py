@@ -1,4 +1,10 @@
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponse
 from django.shortcuts import render
+from django.utils.crypto import constant_time_compare
+
+from . import metrics, slow_queries
 
 
 def page_not_found(request, exception):
@@ -7,3 +13,32 @@ def page_not_found(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def _has_metrics_token(request):
+    token = settings.METRICS_TOKEN
+    return bool(token) and constant_time_compare(
+        request.META.get('HTTP_AUTHORIZATION', ''), f'Bearer {token}'
+    )
+
+
+def metrics_view(request):
+    """Метрики процесса для Prometheus: для сборщика с METRICS_TOKEN
+    и для сотрудников сайта.
+    """
+    if not (_has_metrics_token(request) or request.user.is_staff):
+        raise Http404
+    return HttpResponse(
+        metrics.render(), content_type='text/plain; version=0.0.4'
+    )
+
+
+@staff_member_required
+def slow_queries_view(request):
+    """Последние записи журнала медленных запросов в админке."""
+    context = {
+        'title': 'Медленные запросы',
+        'threshold': settings.SLOW_QUERY_THRESHOLD,
+        'records': slow_queries.read_records(),
+    }
+    return render(request, 'admin/slow_queries.html', context)
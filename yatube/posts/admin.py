@@ -16,6 +16,13 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('created',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по тексту через индекс FTS5, а не LIKE по всей таблице."""
+        if not search_term:
+            return queryset, False
+        found = Post.objects.search(search_term).values('pk')
+        return queryset.filter(pk__in=found), False
+
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group)
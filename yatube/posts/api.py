@@ -0,0 +1,155 @@
+"""JSON API только для чтения: ленты и пост с комментариями.
+
+Строки ответа компактные: автор и группа передаются username и slug.
+Страницы идут по курсорам ``after``/``before``, как в HTML-лентах.
+ETag считается по поколениям лент и версиям карточек из кэша, поэтому
+повторный запрос ленты получает 304 без единого запроса к базе.
+Last-Modified ленты - время смены её поколения, поста - время его
+правки или последнего комментария.
+"""
+from core.decorators import conditional_page
+from core.paginator import CursorPaginator
+from django.conf import settings
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.http import http_date
+
+from .caching import feed_group, feed_key_prefix, feed_modified, post_state
+from .counters import get_stats
+from .models import Comment, Post, User
+
+
+def _datetime(value):
+    return value.isoformat()
+
+
+def _post_row(post):
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'created': _datetime(post.created),
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+        'image': post.image.url if post.image else None,
+    }
+
+
+def _comment_row(comment):
+    return {
+        'id': comment.pk,
+        'text': comment.text,
+        'created': _datetime(comment.created),
+        'author': comment.author.username,
+    }
+
+
+def _page(request, queryset, per_page):
+    paginator = CursorPaginator(queryset, per_page)
+    return paginator.get_cursor_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+
+
+def _json(data, *timestamps):
+    """Ответ JSON с Last-Modified по самой новой из дат."""
+    response = JsonResponse(data, json_dumps_params={
+        'ensure_ascii': False,
+        'separators': (',', ':'),
+    })
+    timestamps = [value for value in timestamps if value is not None]
+    if timestamps:
+        response['Last-Modified'] = http_date(max(timestamps).timestamp())
+    return response
+
+
+def _feed(request, posts, scope, pk='', **extra):
+    page = _page(request, posts, settings.PAGINATOR_PAGES)
+    response = _json({
+        **extra,
+        'results': [_post_row(post) for post in page],
+        'next': page.next_cursor,
+        'previous': page.previous_cursor,
+    })
+    response['Last-Modified'] = http_date(feed_modified(scope, pk))
+    return response
+
+
+@conditional_page(
+    feed_key_prefix('index'), timeout=settings.FEED_CACHE_TIMEOUT
+)
+def index(request):
+    return _feed(request, Post.objects.for_feed(), 'index')
+
+
+@conditional_page(
+    feed_key_prefix('group', 'slug'), timeout=settings.FEED_CACHE_TIMEOUT
+)
+def group_posts(request, slug):
+    group = feed_group(slug)
+    return _feed(
+        request,
+        Post.objects.filter(group=group).for_feed(),
+        'group',
+        slug,
+        group={
+            'slug': group.slug,
+            'title': group.title,
+            'description': group.description,
+            'posts_count': group.posts_count,
+        },
+    )
+
+
+@conditional_page(
+    feed_key_prefix('profile', 'username'),
+    timeout=settings.FEED_CACHE_TIMEOUT,
+)
+def profile(request, username):
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    stats = get_stats(author)
+    return _feed(
+        request,
+        author.posts.for_feed(),
+        'profile',
+        username,
+        author={
+            'username': author.username,
+            'full_name': author.get_full_name(),
+            'posts_count': stats.posts_count,
+            'followers_count': stats.followers_count,
+            'following_count': stats.following_count,
+        },
+    )
+
+
+def _post_state(request, post_id):
+    return post_state(post_id)
+
+
+@conditional_page(_post_state, timeout=settings.FEED_CACHE_TIMEOUT)
+def post_detail(request, post_id):
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), pk=post_id
+    )
+    comments = _page(
+        request,
+        Comment.objects.filter(post=post).with_author(),
+        settings.COMMENTS_PER_PAGE,
+    )
+    return _json(
+        {
+            'post': {
+                **_post_row(post),
+                'updated': _datetime(post.updated),
+                'comments_count': post.comments_count,
+            },
+            'comments': [_comment_row(comment) for comment in comments],
+            'next': comments.next_cursor,
+            'previous': comments.previous_cursor,
+        },
+        post.updated,
+        post.commented,
+    )
@@ -0,0 +1,255 @@
+"""Кэш страниц лент и отрисованных карточек постов.
+
+Страницы лент кэшируются под ключом с поколением ленты: новый,
+изменённый или удалённый пост меняет поколение, и страница сразу
+собирается заново, хотя в кэше она может жить часами.
+
+Карточка кэшируется под ключом из id поста и версий поста, автора
+и группы. Правка поста, смена имени автора или адреса группы меняют
+версию, и карточка просто перестаёт находиться по новому ключу:
+удалять из кэша ничего не нужно. Версии и карточки всей страницы
+читаются двумя запросами get_many.
+
+Группа ленты кэшируется под ключом с теми же поколениями, что
+страница: её число постов меняется вместе с лентой группы, а правка
+и удаление группы меняют поколение сайта или ленты.
+
+Версии и поколения меняются дважды: сразу (это видит код внутри той
+же транзакции) и ещё раз после её фиксации. Иначе параллельный
+запрос мог бы взять новое поколение, прочитать строки до фиксации
+и положить старое содержимое под новый ключ на часы.
+"""
+import time
+
+from core.routers import from_replica
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.shortcuts import get_object_or_404
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from . import thumbnails
+from .models import Group, Post, User
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+CARD_STATS_KEYS = {
+    'hits': 'post_card_stats:hits',
+    'misses': 'post_card_stats:misses',
+}
+
+
+def _generation_key(scope, pk):
+    return f'feed_generation:{scope}:{pk}'
+
+
+def bump_feed_generation(scope, pk=''):
+    """Сменить поколение ленты: главной, группы, профиля или всего сайта."""
+    _bump(_generation_key(scope, pk))
+
+
+def bump_profile_feeds(user_ids):
+    for username in User.objects.filter(
+        pk__in=user_ids
+    ).values_list('username', flat=True):
+        bump_feed_generation('profile', username)
+
+
+def bump_post_feeds(author_id, group_ids):
+    """Сбросить ленты, где виден пост: главную, профиль и группы."""
+    bump_feed_generation('index')
+    bump_profile_feeds([author_id])
+    group_ids = [pk for pk in group_ids if pk is not None]
+    if group_ids:
+        for slug in Group.objects.filter(
+            pk__in=group_ids
+        ).values_list('slug', flat=True):
+            bump_feed_generation('group', slug)
+
+
+def _feed_generations(scope, pk):
+    keys = [_generation_key(scope, pk), _generation_key('site', '')]
+    generations = _get_versions(keys)
+    return [generations[key] for key in keys]
+
+
+def feed_modified(scope, pk=''):
+    """Время последнего изменения ленты в секундах.
+
+    Поколение - метка времени смены, поэтому оно учитывает и правки,
+    и удаления постов, которых не видно по датам самих постов.
+    """
+    return max(_feed_generations(scope, pk)) / 10 ** 9
+
+
+def feed_key_prefix(scope, lookup=None):
+    """Префикс ключа страницы ленты: поколение ленты и всего сайта.
+
+    ``lookup`` - имя аргумента view, который определяет ленту
+    (``slug`` группы, ``username`` автора).
+    """
+    def key_prefix(request, *args, **kwargs):
+        pk = kwargs[lookup] if lookup else ''
+        return 'feed:{}:{}:{}'.format(scope, pk, '.'.join(
+            str(generation) for generation in _feed_generations(scope, pk)
+        ))
+    return key_prefix
+
+
+def feed_group(slug):
+    """Группа ленты из кэша; Http404, если группы нет."""
+    key = 'feed_group:{}:{}'.format(slug, '.'.join(
+        str(generation) for generation in _feed_generations('group', slug)
+    ))
+    group = cache.get(key)
+    if group is None:
+        group = get_object_or_404(Group, slug=slug)
+        timeout = settings.FEED_CACHE_TIMEOUT
+        if from_replica(group):
+            # Как у карточек: группа с отставшей реплики не живёт
+            # под новым поколением дольше, чем реплика догоняет базу.
+            timeout = settings.DATABASE_PRIMARY_STICKY
+        cache.set(key, group, timeout)
+    return group
+
+
+def _version_key(kind, pk):
+    return f'post_card_version:{kind}:{pk}'
+
+
+def _new_version():
+    # Версия-метка времени не повторяется, даже если ключ версии
+    # вытеснили из кэша и его пришлось создать заново.
+    return time.time_ns()
+
+
+def _bump(key):
+    """Сменить версию или поколение сейчас и после фиксации транзакции."""
+    cache.set(key, _new_version(), None)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: cache.set(key, _new_version(), None))
+
+
+def _get_versions(keys):
+    """Прочитать версии разом; недостающие создаются заново.
+
+    Вытесненную версию создаёт через add() первый процесс, остальные
+    читают его значение: иначе каждый процесс записал бы свою версию
+    и отрисовал бы страницу под своим ключом.
+    """
+    versions = cache.get_many(keys)
+    missing = {key: _new_version() for key in keys if key not in versions}
+    if missing:
+        for key, version in missing.items():
+            cache.add(key, version, None)
+        stored = cache.get_many(missing)
+        versions.update({
+            key: stored.get(key, version) for key, version in missing.items()
+        })
+    return versions
+
+
+def bump_card_version(kind, pk):
+    """Сменить версию карточек поста, автора или группы."""
+    _bump(_version_key(kind, pk))
+
+
+def _post_version_keys(post):
+    return (
+        _version_key('post', post.pk),
+        _version_key('author', post.author_id),
+        _version_key('group', post.group_id),
+    )
+
+
+def card_state(post_id, author_id, group_id):
+    """Версии поста, автора и группы одной строкой."""
+    keys = (
+        _version_key('post', post_id),
+        _version_key('author', author_id),
+        _version_key('group', group_id),
+    )
+    versions = _get_versions(keys)
+    return '.'.join(str(versions[key]) for key in keys)
+
+
+def post_state(post_id):
+    """Всё, от чего зависит страница поста, одной строкой.
+
+    Один запрос к базе (даты изменения поста и комментариев, их число)
+    и версии из кэша: карточки, автора, группы и ленты профиля автора,
+    которая меняется вместе с числом его постов. None - поста нет.
+    """
+    row = Post.objects.filter(pk=post_id).values_list(
+        'author_id', 'group_id', 'author__username',
+        'updated', 'commented', 'comments_count',
+    ).order_by().first()
+    if row is None:
+        return None
+    author_id, group_id, username, *dates = row
+    key = _generation_key('profile', username)
+    return ':'.join(str(value) for value in (
+        card_state(post_id, author_id, group_id),
+        _get_versions([key])[key],
+        *dates,
+    ))
+
+
+def _count(name, amount):
+    if not amount:
+        return
+    key = CARD_STATS_KEYS[name]
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        cache.add(key, 0, None)
+        cache.incr(key, amount)
+
+
+def card_stats():
+    """Счётчики попаданий и промахов кэша карточек."""
+    values = cache.get_many(CARD_STATS_KEYS.values())
+    return {
+        name: values.get(key, 0) for name, key in CARD_STATS_KEYS.items()
+    }
+
+
+def reset_card_stats():
+    cache.delete_many(CARD_STATS_KEYS.values())
+
+
+def prefetch_post_cards(posts):
+    """Найти в кэше карточки всех постов страницы разом."""
+    posts = list(posts)
+    if not posts:
+        return
+    version_keys = {
+        key for post in posts for key in _post_version_keys(post)
+    }
+    versions = _get_versions(version_keys)
+    for post in posts:
+        post._card_key = 'post_card:{}:{}'.format(post.pk, '.'.join(
+            str(versions[key]) for key in _post_version_keys(post)
+        ))
+    cards = cache.get_many([post._card_key for post in posts])
+    for post in posts:
+        post._card_html = cards.get(post._card_key)
+    _count('hits', len(cards))
+    # Карточки, которые придётся отрисовать, берут миниатюры пачкой.
+    thumbnails.prefetch(post for post in posts if post._card_html is None)
+
+
+def render_post_card(post):
+    """Карточка поста из кэша; отрисовывается только при промахе."""
+    if not hasattr(post, '_card_key'):
+        prefetch_post_cards([post])
+    if post._card_html is None:
+        post._card_html = render_to_string(CARD_TEMPLATE, {'post': post})
+        timeout = settings.POST_CARD_CACHE_TIMEOUT
+        if from_replica(post):
+            # Реплика могла отстать от версии в ключе: такая карточка
+            # живёт в кэше, только пока реплика не догонит основную базу.
+            timeout = settings.DATABASE_PRIMARY_STICKY
+        cache.set(post._card_key, post._card_html, timeout)
+        _count('misses', 1)
+    return mark_safe(post._card_html)
@@ -0,0 +1,106 @@
+"""Денормализованные счётчики постов, комментариев и подписок.
+
+Счётчики меняются атомарными UPDATE ... SET x = x + 1 в той же
+транзакции, что и сама запись; команда ``recount`` пересчитывает их
+с нуля, если они всё-таки разошлись с данными.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+
+def _bump(queryset, field, delta, **values):
+    if delta < 0:
+        # Разошедшийся счётчик не уводим в минус: его исправит recount.
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    queryset.update(**{field: F(field) + delta}, **values)
+
+
+def bump_user(user_id, field, delta):
+    _bump(UserStats.objects.filter(user_id=user_id), field, delta)
+
+
+def bump_group(group_id, delta):
+    if group_id is not None:
+        _bump(Group.objects.filter(pk=group_id), 'posts_count', delta)
+
+
+def last_comment(outer='pk'):
+    """Подзапрос: дата последнего оставшегося комментария к посту.
+
+    Это значение ``Post.commented`` и после удаления комментария,
+    и после пересчёта.
+    """
+    return Subquery(
+        Comment.objects.filter(post=OuterRef(outer)).order_by(
+            '-created'
+        ).values('created')[:1]
+    )
+
+
+def bump_post(post_id, delta, commented):
+    """Сдвинуть счётчик комментариев и обновить дату последнего."""
+    _bump(
+        Post.objects.filter(pk=post_id), 'comments_count', delta,
+        commented=commented,
+    )
+
+
+def _count(model, field, outer='pk'):
+    """Подзапрос: сколько строк ``model`` ссылаются на внешнюю строку."""
+    return Coalesce(
+        Subquery(
+            model.objects.filter(**{field: OuterRef(outer)}).order_by().values(
+                field
+            ).annotate(total=Count('pk')).values('total'),
+            output_field=IntegerField(),
+        ),
+        0,
+    )
+
+
+def recount_user(user_id):
+    stats, _ = UserStats.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            'posts_count': Post.objects.filter(author_id=user_id).count(),
+            'followers_count': Follow.objects.filter(
+                author_id=user_id
+            ).count(),
+            'following_count': Follow.objects.filter(
+                user_id=user_id
+            ).count(),
+        },
+    )
+    return stats
+
+
+def get_stats(user):
+    """Счётчики пользователя; отсутствующая строка создаётся пересчётом."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        return recount_user(user.pk)
+
+
+def recount_all():
+    """Пересчитать все счётчики одним UPDATE на таблицу."""
+    UserStats.objects.bulk_create(
+        [
+            UserStats(user_id=user_id)
+            for user_id in User.objects.filter(
+                stats__isnull=True
+            ).values_list('pk', flat=True)
+        ]
+    )
+    UserStats.objects.update(
+        posts_count=_count(Post, 'author', 'user_id'),
+        followers_count=_count(Follow, 'author', 'user_id'),
+        following_count=_count(Follow, 'user', 'user_id'),
+    )
+    Group.objects.update(posts_count=_count(Post, 'group'))
+    Post.objects.update(
+        comments_count=_count(Comment, 'post'),
+        commented=last_comment(),
+    )
@@ -0,0 +1,116 @@
+"""Потоковая выгрузка данных приложения posts.
+
+Записи читаются через ``values_list().iterator(chunk_size=...)`` и
+сразу пишутся в файл, поэтому в памяти держится не больше одной
+порции строк, сколько бы их ни было в базе. Формат NDJSON тот же,
+что читает ``import_yatube`` (см. ``posts.importing``); в CSV каждая
+модель пишется в свой файл.
+"""
+import csv
+import gzip
+import json
+import os
+
+from .importing import RECORD_MODELS
+from .models import Comment, Follow, Group, Post, User
+
+# Поля записи каждой модели: (ключ записи, поле в values_list).
+EXPORT_FIELDS = {
+    'user': (
+        ('username', 'username'),
+        ('first_name', 'first_name'),
+        ('last_name', 'last_name'),
+        ('email', 'email'),
+    ),
+    'group': (
+        ('slug', 'slug'),
+        ('title', 'title'),
+        ('description', 'description'),
+    ),
+    'post': (
+        ('id', 'id'),
+        ('author', 'author__username'),
+        ('group', 'group__slug'),
+        ('text', 'text'),
+        ('created', 'created'),
+        ('image', 'image'),
+    ),
+    'comment': (
+        ('id', 'id'),
+        ('post', 'post_id'),
+        ('author', 'author__username'),
+        ('text', 'text'),
+        ('created', 'created'),
+    ),
+    'follow': (
+        ('user', 'user__username'),
+        ('author', 'author__username'),
+    ),
+}
+EXPORT_MODELS = {
+    'user': User,
+    'group': Group,
+    'post': Post,
+    'comment': Comment,
+    'follow': Follow,
+}
+# Модели с датой создания: только их отбирает ``since``.
+DATED_MODELS = ('post', 'comment')
+CHUNK_SIZE = 2000
+
+
+def records(name, since=None, chunk_size=CHUNK_SIZE):
+    """Записи модели ``name`` в порядке первичного ключа."""
+    queryset = EXPORT_MODELS[name].objects.order_by('pk')
+    if since is not None and name in DATED_MODELS:
+        queryset = queryset.filter(created__gte=since)
+    keys = [key for key, _ in EXPORT_FIELDS[name]]
+    rows = queryset.values_list(
+        *(field for _, field in EXPORT_FIELDS[name])
+    ).iterator(chunk_size=chunk_size)
+    for row in rows:
+        record = dict(zip(keys, row))
+        if 'created' in record:
+            record['created'] = record['created'].isoformat()
+        yield record
+
+
+def open_output(path, compress):
+    if compress:
+        return gzip.open(path, 'wt', encoding='utf-8', newline='')
+    return open(path, 'w', encoding='utf-8', newline='')
+
+
+def export_ndjson(file, models=RECORD_MODELS, since=None):
+    """Выгрузить модели в открытый файл NDJSON; вернуть число записей."""
+    counts = {}
+    for name in models:
+        counts[name] = 0
+        for record in records(name, since):
+            file.write(json.dumps(
+                {'model': name, **record}, ensure_ascii=False
+            ) + '\n')
+            counts[name] += 1
+    return counts
+
+
+def export_csv(directory, models=RECORD_MODELS, since=None,
+               compress=False):
+    """Выгрузить каждую модель в свой CSV в каталоге ``directory``."""
+    os.makedirs(directory, exist_ok=True)
+    counts = {}
+    for name in models:
+        path = os.path.join(
+            directory, f'{name}.csv.gz' if compress else f'{name}.csv'
+        )
+        counts[name] = 0
+        with open_output(path, compress) as file:
+            writer = csv.writer(file)
+            writer.writerow(key for key, _ in EXPORT_FIELDS[name])
+            for record in records(name, since):
+                writer.writerow(
+                    '' if value is None else value
+                    for value in record.values()
+                )
+                counts[name] += 1
+    return counts
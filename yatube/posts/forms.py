@@ -1,6 +1,7 @@
+from django import forms
 from django.forms import ModelForm
 
-from .models import Comment, Post
+from .models import Comment, Group, Post
 
 
 class PostForm(ModelForm):
@@ -13,3 +14,15 @@ class CommentForm(ModelForm):
     class Meta:
         model = Comment
         fields = ['text']
+
+
+class SearchForm(forms.Form):
+    q = forms.CharField(label='Поиск', max_length=200)
+    group = forms.ModelChoiceField(
+        Group.objects.all(),
+        to_field_name='slug',
+        required=False,
+        label='Группа',
+        empty_label='Все группы',
+    )
+    author = forms.CharField(label='Автор', max_length=150, required=False)
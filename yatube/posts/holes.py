@@ -0,0 +1,36 @@
+"""Персональные фрагменты общих страниц постов, см. ``core.holes``."""
+from core.holes import register
+from django.template.loader import render_to_string
+
+from .models import Follow
+
+
+@register('switcher')
+def switcher(request, active):
+    """Вкладки «Все авторы» и «Избранные авторы» для вошедших."""
+    return render_to_string(
+        'posts/includes/switcher.html', {active: True}, request
+    )
+
+
+@register('follow_button')
+def follow_button(request, author):
+    """Кнопка подписки на автора в профиле."""
+    following = request.user.is_authenticated and Follow.objects.filter(
+        user=request.user, author__username=author
+    ).exists()
+    return render_to_string(
+        'posts/includes/follow_button.html',
+        {'author': author, 'following': following},
+        request,
+    )
+
+
+@register('edit_link')
+def edit_link(request, post_id, author_id):
+    """Ссылка на правку поста для его автора."""
+    return render_to_string(
+        'posts/includes/edit_link.html',
+        {'post_id': post_id, 'author_id': int(author_id)},
+        request,
+    )
@@ -0,0 +1,348 @@
+"""Потоковый импорт постов, комментариев, групп и подписок из NDJSON.
+
+Каждая строка файла - одна запись с полем ``model``::
+
+    {"model": "user", "username": "leo", "first_name": "Лев"}
+    {"model": "group", "slug": "cats", "title": "Коты", "description": ""}
+    {"model": "post", "id": 7, "author": "leo", "group": "cats",
+     "text": "...", "created": "2021-03-01T10:00:00+00:00", "image": ""}
+    {"model": "comment", "id": 12, "post": 7, "author": "leo",
+     "text": "...", "created": "2021-03-01T11:00:00+00:00"}
+    {"model": "follow", "user": "leo", "author": "tolstoy"}
+
+Авторы и группы указываются по username и slug, посты - по id.
+id постов и комментариев сохраняется при импорте, поэтому повторный
+импорт того же файла их не дублирует; уже существующие записи
+считаются пропущенными, а не импортированными. Файл читается
+построчно: в памяти держится только текущая порция записей
+и ограниченные словари
+username -> id и slug -> id. Порция пишется через bulk_create в одной
+транзакции, после коммита в файл контрольной точки записывается
+смещение в исходном файле, и прерванный импорт продолжается с него.
+
+bulk_create не отправляет сигналы, поэтому счётчики, ленты подписок
+и поколения кэша лент пересчитываются один раз в конце импорта.
+Поисковый индекс обновляют триггеры базы.
+"""
+import gzip
+import json
+import os
+from collections import Counter, defaultdict
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import counters, timeline
+from .caching import bump_feed_generation
+from .models import Comment, Follow, Group, Post, User
+
+# Порядок записи внутри порции: сначала то, на что ссылаются.
+RECORD_MODELS = ('user', 'group', 'post', 'comment', 'follow')
+# Сколько ключей держат словари поиска, прежде чем их сбросить.
+LOOKUP_LIMIT = 100000
+
+
+def open_input(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+class Lookup:
+    """Словарь natural key -> id с дозагрузкой пачкой и пределом размера."""
+
+    def __init__(self, model, field):
+        self.model = model
+        self.field = field
+        self.ids = {}
+
+    def load(self, keys):
+        missing = {key for key in keys if key and key not in self.ids}
+        if not missing:
+            return
+        if len(self.ids) + len(missing) > LOOKUP_LIMIT:
+            self.ids.clear()
+        self.ids.update(self.model.objects.filter(
+            **{f'{self.field}__in': missing}
+        ).values_list(self.field, 'id'))
+
+    def get(self, key):
+        return self.ids.get(key)
+
+
+def _created(record):
+    value = record.get('created')
+    if not value:
+        return timezone.now()
+    created = parse_datetime(value)
+    if created is None:
+        raise ValueError(f'Неверная дата: {value}')
+    if timezone.is_naive(created):
+        created = timezone.make_aware(created, timezone.utc)
+    return created
+
+
+class Importer:
+    """Импорт одного файла NDJSON порциями по ``chunk_size`` записей."""
+
+    def __init__(self, batch_size=1000, chunk_size=10000):
+        self.batch_size = batch_size
+        self.chunk_size = chunk_size
+        self.users = Lookup(User, 'username')
+        self.groups = Lookup(Group, 'slug')
+        self.stats = Counter()
+
+    def run(self, path, checkpoint, resume=False):
+        """Импортировать файл ``path``; вернуть счётчики записей."""
+        offset = 0
+        if resume and os.path.exists(checkpoint):
+            with open(checkpoint) as file:
+                offset = json.load(file)['offset']
+        with open_input(path) as file:
+            file.seek(offset)
+            for chunk, position in self.chunks(self.read(file, offset)):
+                self.write_chunk(chunk)
+                offset = offset if position is None else position
+                with open(checkpoint, 'w') as output:
+                    json.dump({'offset': offset}, output)
+        self.finish()
+        return self.stats
+
+    def load(self, records):
+        """Импортировать записи из итератора, без контрольных точек."""
+        for chunk, _ in self.chunks(
+            (record, None) for record in records
+        ):
+            self.write_chunk(chunk)
+        self.finish()
+        return self.stats
+
+    @staticmethod
+    def read(file, offset):
+        """Записи файла вместе со смещением конца каждой строки."""
+        for line in file:
+            offset += len(line)
+            if line.strip():
+                yield json.loads(line), offset
+
+    def chunks(self, records):
+        """Разложить записи по моделям порциями по ``chunk_size``."""
+        chunk = defaultdict(list)
+        size = 0
+        position = None
+        for record, position in records:
+            if record.get('model') not in RECORD_MODELS:
+                raise ValueError(
+                    f'Неизвестный тип записи: {record.get("model")}'
+                )
+            chunk[record['model']].append(record)
+            size += 1
+            if size >= self.chunk_size:
+                yield chunk, position
+                chunk = defaultdict(list)
+                size = 0
+        yield chunk, position
+
+    def write_chunk(self, chunk):
+        with transaction.atomic():
+            for model in RECORD_MODELS:
+                records = chunk.get(model, [])
+                if records:
+                    self.stats[model] += getattr(
+                        self, f'import_{model}s'
+                    )(records)
+
+    def batch_size_for(self, model, objects):
+        # Django 2.2 не ограничивает явный batch_size пределами базы
+        # (у SQLite - число параметров и частей составного SELECT).
+        return max(min(self.batch_size, connection.ops.bulk_batch_size(
+            model._meta.concrete_fields, objects
+        )), 1)
+
+    def bulk_create(self, model, objects):
+        """Вставить объекты; вернуть их число."""
+        model.objects.bulk_create(
+            objects, batch_size=self.batch_size_for(model, objects)
+        )
+        return len(objects)
+
+    def insert_dated(self, model, objects, date_fields):
+        """Вставить объекты с датами из файла; вернуть их число.
+
+        bulk_create вызывает pre_save, и ``auto_now``/``auto_now_add``
+        заменяют даты текущим временем. Поля моделей не трогаются:
+        даты из файла записываются вторым проходом через bulk_update,
+        который pre_save не вызывает. Для этого у объектов должен быть
+        id; недостающие выдаются после наибольшего id - порция пишется
+        в транзакции, и другой писатель SQLite их не займёт.
+        """
+        missing = [obj for obj in objects if obj.pk is None]
+        if missing:
+            last = max(
+                (obj.pk for obj in objects if obj.pk is not None),
+                default=0,
+            )
+            last = max(
+                last, model.objects.aggregate(last=Max('pk'))['last'] or 0
+            )
+            for pk, obj in enumerate(missing, last + 1):
+                obj.pk = pk
+        dates = [
+            [getattr(obj, name) for name in date_fields] for obj in objects
+        ]
+        self.bulk_create(model, objects)
+        for obj, values in zip(objects, dates):
+            for name, value in zip(date_fields, values):
+                setattr(obj, name, value)
+        model.objects.bulk_update(
+            objects, date_fields,
+            batch_size=self.batch_size_for(model, objects),
+        )
+        return len(objects)
+
+    def skip(self, count=1):
+        self.stats['skipped'] += count
+
+    def new_objects(self, objects, key, existing):
+        """Объекты, ключа которых нет ни в базе, ни выше в порции.
+
+        Остальные (повторный импорт, повтор в файле) пропускаются.
+        Объекты без ключа (None) новые всегда.
+        """
+        seen = set(existing)
+        new = []
+        for obj in objects:
+            value = key(obj)
+            if value is not None and value in seen:
+                self.skip()
+                continue
+            seen.add(value)
+            new.append(obj)
+        return new
+
+    def import_users(self, records):
+        usernames = {record['username'] for record in records}
+        return self.bulk_create(User, self.new_objects(
+            (
+                User(
+                    username=record['username'],
+                    first_name=record.get('first_name', ''),
+                    last_name=record.get('last_name', ''),
+                    email=record.get('email', ''),
+                    password=make_password(None),
+                )
+                for record in records
+            ),
+            lambda user: user.username,
+            User.objects.filter(
+                username__in=usernames
+            ).values_list('username', flat=True),
+        ))
+
+    def import_groups(self, records):
+        slugs = {record['slug'] for record in records}
+        return self.bulk_create(Group, self.new_objects(
+            (
+                Group(
+                    slug=record['slug'],
+                    title=record['title'],
+                    description=record.get('description', ''),
+                )
+                for record in records
+            ),
+            lambda group: group.slug,
+            Group.objects.filter(slug__in=slugs).values_list(
+                'slug', flat=True
+            ),
+        ))
+
+    def import_posts(self, records):
+        self.users.load(record['author'] for record in records)
+        self.groups.load(record.get('group') for record in records)
+        posts = []
+        for record in records:
+            author_id = self.users.get(record['author'])
+            group_id = self.groups.get(record.get('group'))
+            if author_id is None or (record.get('group') and not group_id):
+                self.skip()
+                continue
+            created = _created(record)
+            posts.append(Post(
+                id=record.get('id'),
+                text=record['text'],
+                author_id=author_id,
+                group_id=group_id,
+                image=record.get('image', ''),
+                created=created,
+                updated=created,
+            ))
+        existing = Post.objects.filter(
+            pk__in={post.pk for post in posts}
+        ).values_list('pk', flat=True)
+        return self.insert_dated(
+            Post,
+            self.new_objects(posts, lambda post: post.pk, existing),
+            ['created', 'updated'],
+        )
+
+    def import_comments(self, records):
+        self.users.load(record['author'] for record in records)
+        post_ids = set(Post.objects.filter(
+            pk__in={record['post'] for record in records}
+        ).values_list('pk', flat=True))
+        comments = []
+        for record in records:
+            author_id = self.users.get(record['author'])
+            if author_id is None or record['post'] not in post_ids:
+                self.skip()
+                continue
+            comments.append(Comment(
+                id=record.get('id'),
+                post_id=record['post'],
+                author_id=author_id,
+                text=record['text'],
+                created=_created(record),
+            ))
+        existing = Comment.objects.filter(
+            pk__in={comment.pk for comment in comments}
+        ).values_list('pk', flat=True)
+        return self.insert_dated(
+            Comment,
+            self.new_objects(comments, lambda comment: comment.pk, existing),
+            ['created'],
+        )
+
+    def import_follows(self, records):
+        self.users.load(
+            key for record in records
+            for key in (record['user'], record['author'])
+        )
+        follows = []
+        for record in records:
+            user_id = self.users.get(record['user'])
+            author_id = self.users.get(record['author'])
+            if None in (user_id, author_id) or user_id == author_id:
+                self.skip()
+                continue
+            follows.append(Follow(user_id=user_id, author_id=author_id))
+        existing = Follow.objects.filter(
+            user_id__in={follow.user_id for follow in follows},
+            author_id__in={follow.author_id for follow in follows},
+        ).values_list('user_id', 'author_id')
+        return self.bulk_create(Follow, self.new_objects(
+            follows,
+            lambda follow: (follow.user_id, follow.author_id),
+            existing,
+        ))
+
+    def finish(self):
+        """Пересчитать то, что при записи обновляют сигналы."""
+        counters.recount_all()
+        for user_id in Follow.objects.values_list(
+            'user_id', flat=True
+        ).distinct().iterator():
+            timeline.rebuild(user_id)
+        bump_feed_generation('site')
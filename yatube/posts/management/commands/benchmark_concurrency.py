@@ -0,0 +1,222 @@
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+
+from core.sqlite import pragma_statements
+from posts.management.commands.benchmark_urls import percentile
+from posts.models import Comment, Post, User
+
+# Профили сравнения: настройки SQLite по умолчанию с новым соединением
+# на каждый запрос и боевой профиль, который включает settings_production.
+PROFILES = (
+    ('по умолчанию', {'journal_mode': 'DELETE'}, False, 5),
+    (
+        'боевой',
+        settings.SQLITE_PRODUCTION_PRAGMAS,
+        True,
+        settings.SQLITE_PRODUCTION_TIMEOUT,
+    ),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает пропускную способность SQLite с настройками по '
+        'умолчанию и с боевым профилем (WAL, PRAGMA, постоянные '
+        'соединения) на смеси чтений страницы поста и записи '
+        'комментариев из нескольких потоков. Замеры идут на копии '
+        'рабочей базы; данные для неё - seed_yatube.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seconds', type=float, default=5)
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument(
+            '--posts', type=int, default=100,
+            help='Сколько самых обсуждаемых постов читать и комментировать.',
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Замер рассчитан на SQLite.')
+        post_ids = list(Post.objects.order_by(
+            '-comments_count', '-id'
+        ).values_list('id', flat=True)[:options['posts']])
+        user_ids = list(User.objects.values_list('id', flat=True)[:1000])
+        if not post_ids or not user_ids:
+            raise CommandError('База пуста: сначала запустите seed_yatube.')
+        reads = self.read_queries(post_ids[0])
+        directory = tempfile.mkdtemp()
+        try:
+            results = []
+            for name, pragmas, persistent, timeout in PROFILES:
+                path = os.path.join(directory, f'{len(results)}.sqlite3')
+                self.copy_database(path)
+                workload = Workload(
+                    path, pragmas, persistent, timeout, reads,
+                    post_ids, user_ids,
+                )
+                results.append((name, workload.run(
+                    options['readers'], options['writers'],
+                    options['seconds'],
+                )))
+        finally:
+            shutil.rmtree(directory)
+        self.report(results, options['seconds'])
+
+    def read_queries(self, post_id):
+        """SQL чтений страницы поста так, как его строит ORM."""
+        querysets = (
+            Post.objects.filter(pk=post_id).values_list(
+                'author_id', 'group_id', 'author__username',
+                'updated', 'commented', 'comments_count',
+            ).order_by(),
+            Post.objects.select_related(
+                'author__stats', 'group'
+            ).filter(id=post_id),
+            Comment.objects.filter(post_id=post_id).with_author().order_by(
+                '-created', '-id'
+            )[:settings.COMMENTS_PER_PAGE + 1],
+        )
+        queries = []
+        for queryset in querysets:
+            sql, params = queryset.query.sql_with_params()
+            # Единственный параметр каждого запроса - id поста.
+            assert list(params) == [post_id], params
+            queries.append(sql.replace('%s', '?'))
+        return queries
+
+    def copy_database(self, path):
+        connection.ensure_connection()
+        target = sqlite3.connect(path)
+        try:
+            connection.connection.backup(target)
+        finally:
+            target.close()
+
+    def report(self, results, seconds):
+        baseline = None
+        for name, result in results:
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for kind in ('read', 'write'):
+                timings = result[kind]
+                label = 'чтения' if kind == 'read' else 'записи'
+                if not timings:
+                    self.stdout.write(f'  {label}: нет успешных операций')
+                    continue
+                self.stdout.write(
+                    f'  {label}: {len(timings) / seconds:8.1f} в секунду, '
+                    f'p50 {percentile(timings, 0.5):.2f} мс, '
+                    f'p95 {percentile(timings, 0.95):.2f} мс'
+                )
+            self.stdout.write(f'  ошибки блокировки: {result["errors"]}')
+            total = len(result['read']) + len(result['write'])
+            if baseline is None:
+                baseline = total
+            elif baseline:
+                self.stdout.write(self.style.SUCCESS(
+                    f'  операций в {total / baseline:.2f} раза больше'
+                ))
+
+
+class Workload:
+    """Потоки читателей и писателей на одной копии базы."""
+
+    def __init__(self, path, pragmas, persistent, timeout, reads,
+                 post_ids, user_ids):
+        self.path = path
+        self.pragmas = pragmas
+        self.persistent = persistent
+        self.timeout = timeout
+        self.reads = reads
+        self.post_ids = post_ids
+        self.user_ids = user_ids
+        self.lock = threading.Lock()
+        self.results = {'read': [], 'write': [], 'errors': 0}
+
+    def connect(self):
+        db = sqlite3.connect(
+            self.path, timeout=self.timeout, isolation_level=None,
+            check_same_thread=False,
+        )
+        for statement in pragma_statements(self.pragmas):
+            db.execute(statement)
+        return db
+
+    def read(self, db, rnd):
+        post_id = rnd.choice(self.post_ids)
+        for sql in self.reads:
+            db.execute(sql, [post_id]).fetchall()
+
+    def write(self, db, rnd):
+        post_id = rnd.choice(self.post_ids)
+        now = timezone.now().strftime('%Y-%m-%d %H:%M:%S.%f')
+        # Как add_comment: комментарий и счётчик поста в одной транзакции.
+        db.execute('BEGIN')
+        try:
+            db.execute(
+                'INSERT INTO posts_comment (post_id, author_id, text, '
+                'created) VALUES (?, ?, ?, ?)',
+                [post_id, rnd.choice(self.user_ids), 'Нагрузка', now],
+            )
+            db.execute(
+                'UPDATE posts_post SET comments_count = comments_count + 1, '
+                'commented = ? WHERE id = ?',
+                [now, post_id],
+            )
+            db.execute('COMMIT')
+        except sqlite3.Error:
+            db.execute('ROLLBACK')
+            raise
+
+    def worker(self, kind, deadline, seed):
+        rnd = random.Random(seed)
+        operation = getattr(self, kind)
+        timings = []
+        errors = 0
+        db = self.connect() if self.persistent else None
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            current = db or self.connect()
+            try:
+                operation(current, rnd)
+            except sqlite3.OperationalError:
+                errors += 1
+            else:
+                timings.append((time.perf_counter() - started) * 1000)
+            finally:
+                if current is not db:
+                    current.close()
+        if db is not None:
+            db.close()
+        with self.lock:
+            self.results[kind].extend(timings)
+            self.results['errors'] += errors
+
+    def run(self, readers, writers, seconds):
+        setup = self.connect()
+        setup.close()
+        deadline = time.perf_counter() + seconds
+        threads = [
+            threading.Thread(
+                target=self.worker, args=(kind, deadline, number)
+            )
+            for number, kind in enumerate(
+                ['read'] * readers + ['write'] * writers
+            )
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self.results
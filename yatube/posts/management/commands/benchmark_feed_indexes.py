@@ -0,0 +1,215 @@
+import os
+import random
+import re
+import shutil
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from posts.models import Comment, Follow, Group, Post, User
+
+# Индексы и ограничения, которые добавила миграция 0013_feed_indexes.
+FEED_INDEXES = (
+    'post_group_created_idx',
+    'post_author_created_idx',
+    'comment_post_created_idx',
+)
+FEED_CONSTRAINTS = ('unique_follow',)
+CHUNK_SIZE = 50000
+START = datetime(2023, 1, 1, tzinfo=timezone.utc)
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает планы и время запросов лент без составных индексов '
+        'и с ними. Схема берётся из моделей, данные генерируются '
+        'в отдельном файле SQLite; рабочая база не затрагивается.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--posts', type=int, default=1000000)
+        parser.add_argument('--runs', type=int, default=20)
+        parser.add_argument(
+            '--path',
+            help='Файл базы для замеров (по умолчанию временный).',
+        )
+
+    def handle(self, *args, **options):
+        directory = None if options['path'] else tempfile.mkdtemp()
+        path = options['path'] or os.path.join(
+            directory, 'feed_indexes.sqlite3'
+        )
+        try:
+            create, indexes = self.schema_sql()
+            db = sqlite3.connect(path)
+            try:
+                db.executescript(';\n'.join(create) + ';')
+                self.seed(db, options['posts'])
+                queries = self.queries(options['posts'])
+                before = self.measure(db, queries, options['runs'])
+                self.stdout.write('Создаём составные индексы...')
+                db.executescript(';\n'.join(indexes) + ';')
+                db.execute('ANALYZE')
+                after = self.measure(db, queries, options['runs'])
+            finally:
+                db.close()
+        finally:
+            if directory:
+                shutil.rmtree(directory)
+        self.report(queries, before, after)
+
+    def schema_sql(self):
+        """DDL моделей, разделённый на схему «до» и новые индексы."""
+        with connection.schema_editor(collect_sql=True) as editor:
+            for model in (User, Group, Post, Comment, Follow):
+                editor.create_model(model)
+        create, indexes = [], []
+        for statement in editor.collected_sql:
+            statement = statement.rstrip(';')
+            if any(name in statement for name in FEED_INDEXES):
+                indexes.append(statement)
+                continue
+            # SQLite объявляет UNIQUE прямо в CREATE TABLE: выносим
+            # ограничение в отдельный уникальный индекс для схемы «после».
+            for name in FEED_CONSTRAINTS:
+                constraint = re.search(
+                    rf', CONSTRAINT "{name}" UNIQUE (\([^)]*\))', statement
+                )
+                if constraint:
+                    statement = statement.replace(constraint.group(0), '')
+                    table = re.search(r'CREATE TABLE (\S+)', statement)
+                    indexes.append(
+                        f'CREATE UNIQUE INDEX "{name}" ON {table.group(1)} '
+                        f'{constraint.group(1)}'
+                    )
+            create.append(statement)
+        return create, indexes
+
+    @staticmethod
+    def insert(db, model, rows):
+        """Вставить строки модели мимо ORM.
+
+        ``rows`` - словари attname -> значение; остальные столбцы
+        получают значения по умолчанию полей модели, поэтому новые
+        поля со значением по умолчанию не ломают сидирование.
+        """
+        fields = model._meta.concrete_fields
+        defaults = {
+            field.attname: field.get_db_prep_save(
+                field.get_default(), connection
+            )
+            for field in fields
+        }
+        db.executemany(
+            'INSERT INTO {} ({}) VALUES ({})'.format(
+                model._meta.db_table,
+                ', '.join(field.column for field in fields),
+                ', '.join('?' for _ in fields),
+            ),
+            (
+                [row.get(field.attname, defaults[field.attname])
+                 for field in fields]
+                for row in rows
+            ),
+        )
+
+    def seed(self, db, posts):
+        self.stdout.write(f'Генерируем {posts} постов...')
+        rnd = random.Random(0)
+        users = max(posts // 100, 10)
+        groups = 50
+        # Даты хранятся так же, как их пишет Django: UTC без зоны.
+        start = START.replace(tzinfo=None)
+        self.insert(db, User, (
+            {'id': pk, 'username': f'user{pk}', 'date_joined': str(start)}
+            for pk in range(1, users + 1)
+        ))
+        self.insert(db, Group, (
+            {'id': pk, 'title': f'group{pk}', 'slug': f'group-{pk}'}
+            for pk in range(1, groups + 1)
+        ))
+        for first in range(1, posts + 1, CHUNK_SIZE):
+            last = min(first + CHUNK_SIZE, posts + 1)
+            self.insert(db, Post, (
+                {
+                    'id': pk,
+                    'text': f'Пост {pk}',
+                    'created': str(start + timedelta(seconds=pk)),
+                    'updated': str(start + timedelta(seconds=pk)),
+                    # Пара знаменитостей и много авторов с парой постов.
+                    'author_id': int(rnd.paretovariate(1.2)) % users + 1,
+                    'group_id': rnd.randint(1, groups) if pk % 3 else None,
+                }
+                for pk in range(first, last)
+            ))
+        # Половина комментариев достаётся одному популярному посту.
+        self.insert(db, Comment, (
+            {
+                'text': 'Комментарий',
+                'created': str(start + timedelta(seconds=pk)),
+                'author_id': rnd.randint(1, users),
+                'post_id': posts if pk % 2 else rnd.randint(1, posts),
+            }
+            for pk in range(1, posts // 10 + 1)
+        ))
+        self.insert(db, Follow, (
+            {'user_id': user, 'author_id': author}
+            for user in range(1, users + 1)
+            for author in rnd.sample(range(1, users + 1), 5)
+        ))
+        db.commit()
+        db.execute('ANALYZE')
+
+    def queries(self, posts):
+        """SQL запросов лент так, как его строит ORM."""
+        deep = Post.objects.filter(
+            group_id=1, created__lt=START + timedelta(seconds=posts // 2)
+        ).for_feed().order_by('-created', '-id')[:11]
+        querysets = {
+            'Лента группы': Post.objects.filter(
+                group_id=1
+            ).for_feed().order_by('-created', '-id')[:11],
+            'Лента группы, глубокий курсор': deep,
+            'Лента автора': Post.objects.filter(
+                author_id=1
+            ).for_feed().order_by('-created', '-id')[:11],
+            'Комментарии поста': Comment.objects.filter(
+                post_id=posts
+            ).with_author().order_by('-created', '-id')[:20],
+            'Проверка подписки': Follow.objects.filter(
+                user_id=1, author_id=2
+            ).values('id')[:1],
+        }
+        return {
+            name: queryset.query.sql_with_params()
+            for name, queryset in querysets.items()
+        }
+
+    def measure(self, db, queries, runs):
+        results = {}
+        for name, (sql, params) in queries.items():
+            sql = sql.replace('%s', '?')
+            plan = [row[-1] for row in db.execute(
+                f'EXPLAIN QUERY PLAN {sql}', params
+            )]
+            timings = []
+            for _ in range(runs):
+                started = time.perf_counter()
+                db.execute(sql, params).fetchall()
+                timings.append(time.perf_counter() - started)
+            results[name] = (plan, statistics.median(timings) * 1000)
+        return results
+
+    def report(self, queries, before, after):
+        for name in queries:
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            for label, results in (('до', before), ('после', after)):
+                plan, elapsed = results[name]
+                self.stdout.write(f'  {label}: {elapsed:.3f} мс')
+                for line in plan:
+                    self.stdout.write(f'    {line}')
@@ -0,0 +1,147 @@
+import json
+import math
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import urls
+from posts.models import Group, Post, User
+
+
+def percentile(values, share):
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(share * len(ordered)) - 1, 0)]
+
+
+class Command(BaseCommand):
+    help = (
+        'Прогоняет все адреса posts.urls через тестовый клиент и выводит '
+        'p50/p95/p99 времени ответа, число запросов к базе и размер '
+        'ответа. Результаты пишутся в JSON, который удобно сравнивать '
+        'diff-ом между ветками. Данные для замеров - seed_yatube.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=50)
+        parser.add_argument(
+            '--warmup', type=int, default=3,
+            help='Запросов до замеров (прогрев кэша и шаблонов).',
+        )
+        parser.add_argument(
+            '--output', default='benchmark_urls.json',
+            help='Файл с результатами.',
+        )
+        parser.add_argument(
+            '--user',
+            help='Пользователь клиента (по умолчанию - самый подписанный).',
+        )
+        parser.add_argument(
+            '--anonymous', action='store_true',
+            help='Запросы без входа на сайт.',
+        )
+
+    def handle(self, *args, **options):
+        if options['runs'] < 1 or options['warmup'] < 0:
+            raise CommandError('Нужен хотя бы один замер.')
+        kwargs = self.url_kwargs()
+        client = Client()
+        user = None
+        if not options['anonymous']:
+            user = self.client_user(options['user'])
+            client.force_login(user)
+        results = {}
+        for pattern in urls.urlpatterns:
+            names = pattern.pattern.regex.groupindex
+            path = reverse(
+                f'{urls.app_name}:{pattern.name}',
+                kwargs={name: kwargs[name] for name in names},
+            )
+            results[pattern.name] = self.measure(
+                client, path, options['runs'], options['warmup']
+            )
+            self.report(pattern.name, results[pattern.name])
+        data = {
+            'settings': {
+                'runs': options['runs'],
+                'warmup': options['warmup'],
+                'user': user.username if user else None,
+                'url_kwargs': kwargs,
+            },
+            'dataset': {
+                'users': User.objects.count(),
+                'groups': Group.objects.count(),
+                'posts': Post.objects.count(),
+            },
+            'urls': results,
+        }
+        with open(options['output'], 'w') as file:
+            json.dump(data, file, ensure_ascii=False, indent=2,
+                      sort_keys=True)
+            file.write('\n')
+        self.stdout.write(self.style.SUCCESS(
+            f'Результаты записаны в {options["output"]}'
+        ))
+
+    def url_kwargs(self):
+        """Самые тяжёлые объекты: большая группа, плодовитый автор,
+        самый обсуждаемый пост.
+        """
+        group = Group.objects.order_by('-posts_count', 'id').first()
+        author = User.objects.order_by('-stats__posts_count', 'id').first()
+        post = Post.objects.order_by('-comments_count', '-id').first()
+        if None in (group, author, post):
+            raise CommandError('База пуста: сначала запустите seed_yatube.')
+        return {
+            'slug': group.slug,
+            'username': author.username,
+            'post_id': post.pk,
+        }
+
+    def client_user(self, username):
+        if username:
+            user = User.objects.filter(username=username).first()
+            if user is None:
+                raise CommandError(f'Нет пользователя {username}.')
+            return user
+        return User.objects.order_by('-stats__following_count', 'id').first()
+
+    def measure(self, client, path, runs, warmup):
+        timings, queries = [], []
+        for run in range(warmup + runs):
+            # Некоторые адреса (подписка, отписка) меняют данные даже
+            # на GET: каждый запрос откатывается, чтобы замеры не влияли
+            # друг на друга.
+            with transaction.atomic():
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = client.get(path)
+                    elapsed = time.perf_counter() - started
+                transaction.set_rollback(True)
+            if run >= warmup:
+                timings.append(elapsed * 1000)
+                queries.append(len(captured))
+        return {
+            'path': path,
+            'status': response.status_code,
+            'p50_ms': round(percentile(timings, 0.5), 3),
+            'p95_ms': round(percentile(timings, 0.95), 3),
+            'p99_ms': round(percentile(timings, 0.99), 3),
+            'queries': statistics.median_low(queries),
+            'max_queries': max(queries),
+            'bytes': len(response.content),
+        }
+
+    def report(self, name, result):
+        self.stdout.write(
+            f'{name:<20} {result["status"]} '
+            f'p50 {result["p50_ms"]:8.2f} мс  '
+            f'p95 {result["p95_ms"]:8.2f} мс  '
+            f'p99 {result["p99_ms"]:8.2f} мс  '
+            f'{result["queries"]:3} запр.  {result["bytes"]} байт'
+        )
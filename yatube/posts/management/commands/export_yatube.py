@@ -0,0 +1,65 @@
+from datetime import datetime, time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from posts import exporting
+from posts.importing import RECORD_MODELS
+
+
+class Command(BaseCommand):
+    help = (
+        'Потоково выгружает пользователей, группы, посты, комментарии '
+        'и подписки в NDJSON (формат import_yatube) или CSV.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output',
+            help='Файл NDJSON («-» - стандартный вывод) или каталог для CSV.',
+        )
+        parser.add_argument(
+            '--format', choices=('ndjson', 'csv'), default='ndjson',
+        )
+        parser.add_argument(
+            '--gzip', action='store_true',
+            help='Сжать выгрузку (включается и расширением .gz).',
+        )
+        parser.add_argument(
+            '--since',
+            help='Только посты и комментарии, созданные с этого момента '
+                 '(ISO 8601, дата или дата и время).',
+        )
+        parser.add_argument(
+            '--models', nargs='+', choices=RECORD_MODELS,
+            default=list(RECORD_MODELS),
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None and parse_date(options['since']):
+                since = datetime.combine(parse_date(options['since']), time())
+            if since is None:
+                raise CommandError('Неверная дата в --since.')
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since, timezone.utc)
+        output = options['output']
+        compress = options['gzip'] or output.endswith('.gz')
+        if output == '-' and (compress or options['format'] == 'csv'):
+            raise CommandError(
+                'В стандартный вывод пишется только несжатый NDJSON.'
+            )
+        # Порядок моделей важен для импорта: сначала то, на что ссылаются.
+        models = [name for name in RECORD_MODELS if name in options['models']]
+        if options['format'] == 'csv':
+            counts = exporting.export_csv(output, models, since, compress)
+        elif output == '-':
+            counts = exporting.export_ndjson(self.stdout, models, since)
+        else:
+            with exporting.open_output(output, compress) as file:
+                counts = exporting.export_ndjson(file, models, since)
+        for name, count in counts.items():
+            self.stderr.write(f'{name}: {count}')
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.importing import Importer
+
+
+class Command(BaseCommand):
+    help = (
+        'Импортирует пользователей, группы, посты, комментарии и подписки '
+        'из файла NDJSON (можно .gz) порциями через bulk_create.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Файл NDJSON или NDJSON.gz.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Строк в одном INSERT (bulk_create).',
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=10000,
+            help='Записей в одной транзакции.',
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл контрольной точки (по умолчанию <path>.checkpoint).',
+        )
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Продолжить с последней контрольной точки.',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1 or options['chunk_size'] < 1:
+            raise CommandError('Размеры порций должны быть положительными.')
+        importer = Importer(options['batch_size'], options['chunk_size'])
+        try:
+            stats = importer.run(
+                options['path'],
+                options['checkpoint'] or f'{options["path"]}.checkpoint',
+                resume=options['resume'],
+            )
+        except (OSError, ValueError, KeyError) as error:
+            raise CommandError(f'Импорт прерван: {error!r}')
+        for name, count in sorted(stats.items()):
+            self.stdout.write(f'{name}: {count}')
+        self.stdout.write(self.style.SUCCESS('Импорт завершён.'))
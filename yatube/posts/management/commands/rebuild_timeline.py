@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import timeline
+from posts.models import Follow, TimelineEntry, User
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает ленты подписок по текущим подпискам.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'usernames', nargs='*',
+            help='Чьи ленты пересобрать (по умолчанию все).',
+        )
+
+    def handle(self, *args, **options):
+        usernames = options['usernames']
+        if usernames:
+            user_ids = set(User.objects.filter(
+                username__in=usernames
+            ).values_list('id', flat=True))
+            if len(user_ids) != len(set(usernames)):
+                raise CommandError('Часть пользователей не найдена.')
+        else:
+            user_ids = set(
+                Follow.objects.values_list('user_id', flat=True).distinct()
+            ) | set(
+                TimelineEntry.objects.values_list(
+                    'user_id', flat=True
+                ).distinct()
+            )
+        for user_id in sorted(user_ids):
+            timeline.rebuild(user_id)
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересобрано лент: {len(user_ids)}'
+        ))
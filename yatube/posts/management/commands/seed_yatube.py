@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max
+
+from posts import seeding
+from posts.importing import Importer
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, группами, постами, '
+        'комментариями и подписками с перекосом в сторону знаменитостей. '
+        'Данные пишутся через bulk_create, как при импорте.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=50000)
+        parser.add_argument('--comments', type=int, default=100000)
+        parser.add_argument('--follows', type=int, default=20000)
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Зерно генератора: одно зерно - одни и те же данные.',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--chunk-size', type=int, default=10000)
+
+    def handle(self, *args, **options):
+        counts = [
+            options[name]
+            for name in ('users', 'groups', 'posts', 'comments', 'follows')
+        ]
+        if min(counts) < 0 or options['users'] < 1:
+            raise CommandError('Нужен хотя бы один пользователь.')
+        if options['batch_size'] < 1 or options['chunk_size'] < 1:
+            raise CommandError('Размеры порций должны быть положительными.')
+        last_id = Post.objects.aggregate(last=Max('id'))['last'] or 0
+        importer = Importer(options['batch_size'], options['chunk_size'])
+        stats = importer.load(seeding.records(
+            *counts, seed=options['seed'], first_post_id=last_id + 1
+        ))
+        for name, count in sorted(stats.items()):
+            self.stdout.write(f'{name}: {count}')
+        self.stdout.write(self.style.SUCCESS('База заполнена.'))
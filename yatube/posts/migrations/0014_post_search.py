@@ -0,0 +1,60 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+import posts.models
+
+# Индекс хранит только токены (external content), тексты остаются
+# в posts_post. Триггеры держат индекс в согласии с постами при любой
+# записи, в том числе при bulk_create и QuerySet.update().
+CREATE_SEARCH = [
+    "CREATE VIRTUAL TABLE posts_post_search USING fts5("
+    "text, content='posts_post', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+    "CREATE TRIGGER posts_post_search_insert AFTER INSERT ON posts_post "
+    "BEGIN "
+    "INSERT INTO posts_post_search(rowid, text) VALUES (new.id, new.text); "
+    "END",
+    "CREATE TRIGGER posts_post_search_delete AFTER DELETE ON posts_post "
+    "BEGIN "
+    "INSERT INTO posts_post_search(posts_post_search, rowid, text) "
+    "VALUES ('delete', old.id, old.text); "
+    "END",
+    "CREATE TRIGGER posts_post_search_update AFTER UPDATE OF text "
+    "ON posts_post "
+    "BEGIN "
+    "INSERT INTO posts_post_search(posts_post_search, rowid, text) "
+    "VALUES ('delete', old.id, old.text); "
+    "INSERT INTO posts_post_search(rowid, text) VALUES (new.id, new.text); "
+    "END",
+    "INSERT INTO posts_post_search(posts_post_search) VALUES ('rebuild')",
+]
+DROP_SEARCH = [
+    'DROP TRIGGER IF EXISTS posts_post_search_update',
+    'DROP TRIGGER IF EXISTS posts_post_search_delete',
+    'DROP TRIGGER IF EXISTS posts_post_search_insert',
+    'DROP TABLE posts_post_search',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_feed_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostSearch',
+            fields=[
+                ('post', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search', serialize=False, to='posts.Post')),
+                ('text', posts.models.SearchTextField()),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'posts_post_search',
+                'managed': False,
+            },
+        ),
+        migrations.RunSQL(CREATE_SEARCH, DROP_SEARCH),
+    ]
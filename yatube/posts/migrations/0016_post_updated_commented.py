@@ -0,0 +1,40 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:40
+
+from django.db import migrations, models
+from django.db.models import F, Max, OuterRef, Subquery
+import django.utils.timezone
+
+
+def fill_dates(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    Comment = apps.get_model('posts', 'Comment')
+    Post.objects.update(
+        updated=F('created'),
+        commented=Subquery(
+            Comment.objects.filter(post=OuterRef('pk')).order_by().values(
+                'post'
+            ).annotate(last=Max('created')).values('last')
+        ),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='updated',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now, verbose_name='Дата изменения'),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='commented',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Дата последнего комментария'),
+        ),
+        migrations.RunPython(fill_dates, migrations.RunPython.noop),
+    ]
@@ -1,20 +1,64 @@
-from core.models import CreatedModel
+from core.models import AtomicSaveModel, CountersModel, CreatedModel
 from django.contrib.auth import get_user_model
 from django.db import models
+from django.db.models import F, Lookup
+from django.utils.functional import cached_property
+
+from . import variants
+from .search import match_query
 
 User = get_user_model()
 
+# Поля поста, которые выводятся в карточке ленты.
+POST_CARD_FIELDS = (
+    'text',
+    'created',
+    'image',
+    'image_variants',
+    'author__username',
+    'author__first_name',
+    'author__last_name',
+    'group__slug',
+    'group__title',
+)
+
+
+class Group(CountersModel):
+    counter_fields = ('posts_count',)
 
-class Group(models.Model):
     title = models.CharField(max_length=200)
     slug = models.SlugField(unique=True)
     description = models.TextField()
+    posts_count = models.PositiveIntegerField(
+        'Количество постов',
+        default=0,
+        editable=False,
+    )
 
     def __str__(self):
         return self.title
 
 
-class Post(CreatedModel):
+class PostQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Посты для лент: автор и группа одним запросом, без лишних полей."""
+        return self.select_related('author', 'group').only(
+            'author', 'group', *POST_CARD_FIELDS
+        )
+
+    def search(self, text):
+        """Посты по поисковому запросу, релевантность - в ``rank``."""
+        query = match_query(text)
+        if not query:
+            return self.none()
+        return self.filter(search__text__match=query).annotate(
+            rank=F('search__rank')
+        )
+
+
+class Post(CreatedModel, AtomicSaveModel, CountersModel):
+    counter_fields = ('comments_count', 'commented')
+
     text = models.TextField(
         'Текст поста',
         help_text='Введите текст поста'
@@ -41,17 +85,98 @@ class Post(CreatedModel):
     )
     # Аргумент upload_to указывает директорию,
     # в которую будут загружаться пользовательские файлы.
+    image_variants = models.TextField(
+        'Варианты картинки',
+        blank=True,
+        editable=False,
+        help_text='Манифест вариантов картинки в JSON',
+    )
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False,
+    )
+    updated = models.DateTimeField('Дата изменения', auto_now=True)
+    # Дата последнего комментария под постом; без комментариев - None.
+    commented = models.DateTimeField(
+        'Дата последнего комментария',
+        null=True,
+        blank=True,
+        editable=False,
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ('-created',)
         verbose_name = 'Пост'
         verbose_name_plural = 'Посты'
+        # Ленты группы и автора фильтруют по FK и идут по (-created, -id):
+        # составной индекс отдаёт страницу без сортировки.
+        indexes = [
+            models.Index(
+                fields=('group', '-created', '-id'),
+                name='post_group_created_idx',
+            ),
+            models.Index(
+                fields=('author', '-created', '-id'),
+                name='post_author_created_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    @cached_property
+    def responsive_image(self):
+        return variants.responsive_image(self)
+
+
+class SearchTextField(models.TextField):
+    """Столбец полнотекстового индекса FTS5."""
 
-class Comment(CreatedModel):
+
+@SearchTextField.register_lookup
+class Match(Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+
+class PostSearch(models.Model):
+    """Строка полнотекстового индекса постов (виртуальная таблица FTS5).
+
+    Таблица создаётся и обновляется миграцией 0014_post_search и
+    триггерами базы, а не Django.
+    """
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        related_name='search',
+    )
+    text = SearchTextField()
+    # Скрытый столбец FTS5: bm25() строки в запросе с MATCH.
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'posts_post_search'
+
+
+class CommentQuerySet(models.QuerySet):
+    def with_author(self):
+        """Комментарии вместе с именем автора, без лишних полей."""
+        return self.select_related('author').only(
+            'text', 'created', 'post', 'author__username'
+        )
+
+
+class Comment(CreatedModel, AtomicSaveModel):
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
@@ -69,11 +194,21 @@ class Comment(CreatedModel):
         help_text='Введите текст комментария'
     )
 
+    objects = CommentQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=('post', '-created', '-id'),
+                name='comment_post_created_idx',
+            ),
+        ]
+
     def __str__(self):
         return self.text
 
 
-class Follow(models.Model):
+class Follow(AtomicSaveModel):
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -87,5 +222,92 @@ class Follow(models.Model):
         verbose_name='Автор'
     )
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'author'),
+                name='unique_follow',
+            ),
+        ]
+
     def __str__(self):
         return self.text
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, которые поддерживаются при записи."""
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name='stats',
+        verbose_name='Пользователь'
+    )
+    posts_count = models.PositiveIntegerField('Количество постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Количество подписчиков',
+        default=0,
+    )
+    following_count = models.PositiveIntegerField(
+        'Количество подписок',
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики пользователя'
+        verbose_name_plural = 'Счётчики пользователей'
+
+    def __str__(self):
+        return str(self.user)
+
+
+class TimelineEntryQuerySet(models.QuerySet):
+    def for_feed(self):
+        """Записи ленты с постами, как в Post.objects.for_feed()."""
+        return self.select_related('post__author', 'post__group').only(
+            'created', 'post', 'post__author', 'post__group',
+            *(f'post__{field}' for field in POST_CARD_FIELDS)
+        )
+
+
+class TimelineEntry(models.Model):
+    """Запись ленты подписок: пост автора, на которого подписан читатель.
+
+    Лента заполняется при публикации поста (fan-out on write), поэтому
+    страница «Избранные авторы» читается одним проходом по индексу
+    (user, -created) вместо подзапроса по подпискам и сортировки.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='Читатель'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост'
+    )
+    # Копия Post.created: сортировка ленты не требует соединения таблиц.
+    created = models.DateTimeField('Дата создания поста')
+
+    objects = TimelineEntryQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи ленты'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'post'),
+                name='unique_timeline_entry',
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', '-created', '-post'),
+                name='timeline_user_created_idx',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user} <- {self.post}'
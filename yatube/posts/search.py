@@ -0,0 +1,85 @@
+"""Полнотекстовый поиск по постам на SQLite FTS5.
+
+Индекс ``posts_post_search`` хранит только токены текста постов
+(external content): сами тексты читаются из ``posts_post``. Индекс
+обновляют триггеры базы из миграции 0014_post_search, поэтому он не
+расходится с постами даже при bulk_create и ``QuerySet.update()``,
+которые обходят сигналы. SQLite удаляет триггеры вместе с таблицей,
+а миграции, меняющие ``posts_post``, пересоздают её, поэтому после
+каждого migrate недостающие триггеры ставятся заново
+(``install_triggers``). Команда ``rebuild_search`` собирает индекс
+заново.
+"""
+import re
+
+from django.db import connection
+
+SEARCH_TABLE = 'posts_post_search'
+# bm25() в FTS5 тем меньше, чем релевантнее пост; при равной
+# релевантности выше новые посты.
+SEARCH_ORDERING = ('rank', '-id')
+
+
+TRIGGERS = {
+    'posts_post_search_insert': (
+        'AFTER INSERT ON posts_post BEGIN '
+        'INSERT INTO posts_post_search(rowid, text) '
+        'VALUES (new.id, new.text); '
+        'END'
+    ),
+    'posts_post_search_delete': (
+        'AFTER DELETE ON posts_post BEGIN '
+        'INSERT INTO posts_post_search(posts_post_search, rowid, text) '
+        "VALUES ('delete', old.id, old.text); "
+        'END'
+    ),
+    'posts_post_search_update': (
+        'AFTER UPDATE OF text ON posts_post BEGIN '
+        'INSERT INTO posts_post_search(posts_post_search, rowid, text) '
+        "VALUES ('delete', old.id, old.text); "
+        'INSERT INTO posts_post_search(rowid, text) '
+        'VALUES (new.id, new.text); '
+        'END'
+    ),
+}
+
+
+def match_query(text):
+    """Запрос FTS5 из пользовательского ввода.
+
+    Каждое слово берётся в кавычки, поэтому операторы FTS5 (NEAR,
+    OR, «*», «:») в запросе пользователя не работают и не ломают его.
+    Все слова должны встретиться в посте.
+    """
+    return ' '.join(f'"{word}"' for word in re.findall(r'\w+', text))
+
+
+def install_triggers(using=connection):
+    """Поставить недостающие триггеры индекса и перестроить его.
+
+    Пока триггеров не было, индекс мог отстать от постов.
+    """
+    with using.cursor() as cursor:
+        cursor.execute(
+            "SELECT type, name FROM sqlite_master "
+            "WHERE name = %s OR type = 'trigger'",
+            [SEARCH_TABLE],
+        )
+        existing = {name for _, name in cursor.fetchall()}
+        if SEARCH_TABLE not in existing:
+            return
+        missing = set(TRIGGERS) - existing
+        for name in sorted(missing):
+            cursor.execute(f'CREATE TRIGGER {name} {TRIGGERS[name]}')
+    if missing:
+        rebuild(using)
+
+
+def rebuild(using=connection):
+    """Собрать индекс заново по текущим постам и сжать его."""
+    with using.cursor() as cursor:
+        for command in ('rebuild', 'optimize'):
+            cursor.execute(
+                f'INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES (%s)',
+                [command],
+            )
@@ -0,0 +1,81 @@
+"""Синтетические данные для нагрузочных замеров.
+
+Распределения перекошены, как в живой соцсети: у пары знаменитостей
+тысячи постов и подписчиков, у большинства авторов - по несколько
+постов; комментарии собираются под немногими свежими постами.
+Записи генерируются в формате импорта (см. ``importing``) и пишутся
+тем же ``Importer`` через bulk_create, поэтому счётчики, ленты подписок
+и поисковый индекс после сидирования такие же, как после импорта.
+Генератор детерминирован: одно и то же ``seed`` даёт одни и те же данные.
+"""
+import random
+from datetime import datetime, timedelta, timezone
+
+START = datetime(2023, 1, 1, tzinfo=timezone.utc)
+WORDS = (
+    'кот', 'собака', 'лес', 'река', 'город', 'утро', 'вечер', 'книга',
+    'дорога', 'море', 'снег', 'солнце', 'чай', 'работа', 'друг', 'музыка',
+    'фильм', 'поезд', 'сад', 'окно', 'письмо', 'птица', 'дождь', 'небо',
+)
+
+
+def skewed(rnd, count, alpha=1.2):
+    """Номер от 0 до ``count - 1``; малые номера выпадают намного чаще."""
+    return (int(rnd.paretovariate(alpha)) - 1) % count
+
+
+def _text(rnd, shortest, longest):
+    return ' '.join(rnd.choices(WORDS, k=rnd.randint(shortest, longest)))
+
+
+def records(users, groups, posts, comments, follows, seed=0,
+            first_post_id=1):
+    """Записи импорта: пользователи, группы, посты, комментарии, подписки.
+
+    Посты получают id подряд с ``first_post_id`` и даты по минуте
+    друг за другом, так что самые свежие посты - с большими id.
+    """
+    rnd = random.Random(seed)
+    for number in range(users):
+        yield {
+            'model': 'user',
+            'username': f'seed{number}',
+            'first_name': 'Автор',
+            'last_name': str(number),
+        }
+    for number in range(groups):
+        yield {
+            'model': 'group',
+            'slug': f'seed-{number}',
+            'title': f'Группа {number}',
+            'description': _text(rnd, 3, 10),
+        }
+    for number in range(posts):
+        group = skewed(rnd, groups) if groups and rnd.random() < 0.7 else None
+        yield {
+            'model': 'post',
+            'id': first_post_id + number,
+            'author': f'seed{skewed(rnd, users)}',
+            'group': None if group is None else f'seed-{group}',
+            'text': _text(rnd, 5, 80),
+            'created': (START + timedelta(minutes=number)).isoformat(),
+        }
+    for _ in range(comments if posts else 0):
+        number = posts - 1 - skewed(rnd, posts)
+        created = START + timedelta(
+            minutes=number, seconds=rnd.randint(1, 86400)
+        )
+        yield {
+            'model': 'comment',
+            'post': first_post_id + number,
+            'author': f'seed{rnd.randrange(users)}',
+            'text': _text(rnd, 1, 30),
+            'created': created.isoformat(),
+        }
+    for _ in range(follows if users > 1 else 0):
+        # Повторы и подписки на себя импорт пропускает.
+        yield {
+            'model': 'follow',
+            'user': f'seed{rnd.randrange(users)}',
+            'author': f'seed{skewed(rnd, users)}',
+        }
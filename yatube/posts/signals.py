@@ -0,0 +1,146 @@
+from functools import partial
+
+from django.db import connections
+from django.db.models.signals import (post_delete, post_migrate, post_save,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import counters, search, thumbnails, timeline, variants
+from .caching import (bump_card_version, bump_feed_generation,
+                      bump_post_feeds, bump_profile_feeds)
+from .models import Comment, Follow, Group, Post, User, UserStats
+
+# Поля пользователя, которые выводятся в карточке поста.
+CARD_USER_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Запоминаем поля карточки, чтобы сбрасывать карточки и ленты, только
+    # если они изменились: вход в систему тоже сохраняет пользователя.
+    instance._previous_card = None
+    if instance.pk and not raw and (
+        update_fields is None or CARD_USER_FIELDS & set(update_fields)
+    ):
+        instance._previous_card = User.objects.filter(
+            pk=instance.pk
+        ).values(*CARD_USER_FIELDS).first()
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        UserStats.objects.create(user=instance)
+        return
+    card = {field: getattr(instance, field) for field in CARD_USER_FIELDS}
+    if instance._previous_card not in (None, card):
+        bump_card_version('author', instance.pk)
+        bump_feed_generation('site')
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        bump_card_version('group', instance.pk)
+        bump_feed_generation('site')
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    bump_card_version('group', instance.pk)
+    bump_feed_generation('site')
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, raw=False, **kwargs):
+    # Запоминаем прежнюю группу, чтобы перенести пост между счётчиками,
+    # и прежнюю картинку, чтобы нарезать миниатюры только для новой.
+    instance._previous_group_id = None
+    instance._previous_image = ''
+    if instance.pk and not raw:
+        instance._previous_group_id, instance._previous_image = (
+            Post.objects.filter(pk=instance.pk).values_list(
+                'group_id', 'image'
+            ).first() or (None, '')
+        )
+    if not raw and instance.image.name != instance._previous_image:
+        # Варианты прежней картинки больше не подходят.
+        instance.image_variants = ''
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    bump_post_feeds(
+        instance.author_id, {instance._previous_group_id, instance.group_id}
+    )
+    if instance.image.name != instance._previous_image:
+        thumbnails.schedule(
+            instance.image.name,
+            partial(image_ready, instance, instance.image.name),
+        )
+    if created:
+        counters.bump_user(instance.author_id, 'posts_count', 1)
+        counters.bump_group(instance.group_id, 1)
+        timeline.fan_out(instance)
+        return
+    bump_card_version('post', instance.pk)
+    if instance._previous_group_id != instance.group_id:
+        counters.bump_group(instance._previous_group_id, -1)
+        counters.bump_group(instance.group_id, 1)
+
+
+def image_ready(post, name):
+    """Миниатюры нарезаны: готовим варианты картинки и сбрасываем карточки,
+    отрисованные с исходной картинкой.
+    """
+    manifest = variants.build(name)
+    Post.objects.filter(pk=post.pk, image=name).update(
+        image_variants=variants.dumps(manifest)
+    )
+    bump_card_version('post', post.pk)
+    bump_post_feeds(post.author_id, {post.group_id})
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    bump_post_feeds(instance.author_id, {instance.group_id})
+    counters.bump_user(instance.author_id, 'posts_count', -1)
+    counters.bump_group(instance.group_id, -1)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_post(instance.post_id, 1, instance.created)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.bump_post(instance.post_id, -1, counters.last_comment())
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.bump_user(instance.author_id, 'followers_count', 1)
+        counters.bump_user(instance.user_id, 'following_count', 1)
+        timeline.backfill(instance.user_id, instance.author_id)
+        bump_profile_feeds([instance.user_id, instance.author_id])
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.bump_user(instance.author_id, 'followers_count', -1)
+    counters.bump_user(instance.user_id, 'following_count', -1)
+    timeline.prune(instance.user_id, instance.author_id)
+    bump_profile_feeds([instance.user_id, instance.author_id])
+
+
+@receiver(post_migrate)
+def migrated(sender, using, **kwargs):
+    if sender.label == 'posts':
+        search.install_triggers(connections[using])
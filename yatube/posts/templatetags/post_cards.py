@@ -0,0 +1,11 @@
+from django import template
+
+from posts.caching import render_post_card
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_card(post):
+    """Карточка поста для лент, через кэш фрагментов."""
+    return render_post_card(post)
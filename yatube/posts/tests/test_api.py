@@ -0,0 +1,133 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..caching import _generation_key
+from ..models import Comment, Group, Post
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='Author', first_name='Имя', last_name='Фамилия')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, text=f'Тестовый текст {i}',
+                group=cls.group)
+            for i in range(12)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_feeds(self):
+        """Ленты отдают компактные строки и курсор следующей страницы."""
+        urls = {
+            reverse('posts:api_index'): None,
+            reverse('posts:api_group', kwargs={'slug': 'test-slug'}):
+                'group',
+            reverse('posts:api_profile', kwargs={'username': 'Author'}):
+                'author',
+        }
+        for url, meta in urls.items():
+            with self.subTest(url=url):
+                data = self.client.get(url).json()
+                self.assertEqual(data['results'][0], {
+                    'id': self.posts[-1].pk,
+                    'text': 'Тестовый текст 11',
+                    'created': self.posts[-1].created.isoformat(),
+                    'author': 'Author',
+                    'group': 'test-slug',
+                    'image': None,
+                })
+                if meta:
+                    self.assertEqual(data[meta]['posts_count'], 12)
+                second = self.client.get(url, {'after': data['next']}).json()
+                self.assertEqual(
+                    [row['id'] for row in second['results']],
+                    [post.pk for post in self.posts[1::-1]])
+
+    def test_feed_not_modified_without_queries(self):
+        """Повторный запрос ленты получает 304 без запросов к базе."""
+        url = reverse('posts:api_index')
+        response = self.client.get(url)
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(0):
+            cached = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached['ETag'], response['ETag'])
+        with self.assertNumQueries(0):
+            cached = self.client.get(
+                url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(cached.status_code, 304)
+        Post.objects.create(author=self.author, text='Новый пост')
+        fresh = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(fresh.status_code, 200)
+        self.assertNotEqual(fresh['ETag'], response['ETag'])
+
+    def test_feed_modified_by_delete(self):
+        """Удаление поста меняет Last-Modified ленты."""
+        url = reverse('posts:api_index')
+        # Поколения из прошлого: новое будет заметно позже с точностью
+        # до секунды.
+        cache.set_many({
+            _generation_key('index', ''): 10 ** 18,
+            _generation_key('site', ''): 10 ** 18,
+        }, None)
+        response = self.client.get(url)
+        Post.objects.get(pk=self.posts[-1].pk).delete()
+        fresh = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(fresh.status_code, 200)
+        self.assertNotEqual(fresh['Last-Modified'], response['Last-Modified'])
+
+    @override_settings(COMMENTS_PER_PAGE=2)
+    def test_post_detail(self):
+        """Пост отдаётся с комментариями постранично и с ETag."""
+        post = self.posts[0]
+        reader = User.objects.create_user(username='Reader')
+        comments = [
+            Comment.objects.create(
+                post=post, author=reader, text=f'Комментарий {i}')
+            for i in range(3)
+        ]
+        url = reverse('posts:api_post_detail', kwargs={'post_id': post.pk})
+        response = self.client.get(url)
+        data = response.json()
+        self.assertEqual(data['post']['comments_count'], 3)
+        self.assertEqual(
+            [row['id'] for row in data['comments']],
+            [comments[2].pk, comments[1].pk])
+        self.assertEqual(data['comments'][0]['author'], 'Reader')
+        with self.assertNumQueries(1):
+            cached = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        Comment.objects.create(post=post, author=reader, text='Ещё один')
+        fresh = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(fresh.status_code, 200)
+
+    def test_missing_objects(self):
+        """Несуществующие объекты дают 404."""
+        urls = (
+            reverse('posts:api_post_detail', kwargs={'post_id': 999}),
+            reverse('posts:api_group', kwargs={'slug': 'missing'}),
+            reverse('posts:api_profile', kwargs={'username': 'missing'}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
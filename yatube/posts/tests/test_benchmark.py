@@ -0,0 +1,109 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+
+from .. import urls
+from ..models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+class BenchmarkTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        call_command(
+            'seed_yatube', '--users', '30', '--groups', '3', '--posts',
+            '300', '--comments', '200', '--follows', '100',
+            stdout=StringIO(),
+        )
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_seed_is_skewed(self):
+        """Сидирование даёт знаменитостей и много мелких авторов."""
+        self.assertEqual(Post.objects.count(), 300)
+        self.assertEqual(Comment.objects.count(), 200)
+        self.assertTrue(Follow.objects.exists())
+        counts = list(UserStats.objects.order_by(
+            '-posts_count').values_list('posts_count', flat=True))
+        self.assertEqual(sum(counts), 300)
+        self.assertGreater(counts[0], 300 // 30 * 5)
+        self.assertEqual(
+            User.objects.order_by('-stats__followers_count').first().username,
+            'seed0')
+
+    def test_benchmark_writes_every_url(self):
+        """Замер проходит по всем адресам posts.urls и пишет JSON."""
+        output = os.path.join(self.directory, 'result.json')
+        call_command(
+            'benchmark_urls', '--runs', '2', '--warmup', '0',
+            '--output', output, stdout=StringIO(),
+        )
+        with open(output) as file:
+            data = json.load(file)
+        self.assertEqual(
+            set(data['urls']),
+            {pattern.name for pattern in urls.urlpatterns})
+        result = data['urls']['index']
+        self.assertEqual(result['status'], 200)
+        self.assertGreater(result['bytes'], 0)
+        self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+        self.assertEqual(data['dataset']['posts'], 300)
+
+
+class ConcurrencyBenchmarkTests(TransactionTestCase):
+    # Копия базы снимается через backup API SQLite, а он не может
+    # читать базу, пока тест держит её транзакцию открытой.
+
+    def test_concurrency_benchmark(self):
+        """Замер конкурентности сравнивает оба профиля SQLite."""
+        call_command(
+            'seed_yatube', '--users', '10', '--groups', '2', '--posts',
+            '50', '--comments', '20', '--follows', '10', stdout=StringIO(),
+        )
+        output = StringIO()
+        call_command(
+            'benchmark_concurrency', '--seconds', '0.2', '--readers', '2',
+            '--writers', '1', stdout=output,
+        )
+        text = output.getvalue()
+        self.assertIn('по умолчанию', text)
+        self.assertIn('боевой', text)
+        self.assertIn('раза больше', text)
+        # Замеры пишут только в копии базы.
+        self.assertEqual(Comment.objects.count(), 20)
+
+
+class FeedIndexesBenchmarkTests(TransactionTestCase):
+    # Схему для замера собирает schema_editor, а SQLite не даёт открыть
+    # его внутри транзакции теста.
+
+    def test_feed_indexes_benchmark(self):
+        """Замер индексов лент сидирует отдельную базу и сравнивает
+        планы до и после.
+        """
+        output = StringIO()
+        directory = tempfile.mkdtemp()
+        with mock.patch('tempfile.mkdtemp', return_value=directory):
+            call_command(
+                'benchmark_feed_indexes', '--posts', '300', '--runs', '1',
+                stdout=output,
+            )
+        text = output.getvalue()
+        self.assertIn('Лента группы', text)
+        self.assertIn('после', text)
+        self.assertIn('post_group_created_idx', text)
+        self.assertFalse(os.path.exists(directory))
@@ -0,0 +1,109 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..caching import card_stats
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class PostCardCacheTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user1 = User.objects.create_user(
+            username='NoName1', first_name='Имя', last_name='Фамилия')
+        cls.authorized_client1 = Client()
+        cls.authorized_client1.force_login(cls.user1)
+        cls.group1 = Group.objects.create(
+            title='Тестовая группа1',
+            slug='test-slug1',
+            description='Тестовое описание1',
+        )
+        cls.post1 = Post.objects.create(
+            author=cls.user1,
+            text='Тестовый текст1',
+            group=cls.group1,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('posts:profile', kwargs={'username': 'NoName1'})
+
+    def test_cards_are_served_from_cache(self):
+        """Повторная отрисовка страницы берёт карточку из кэша."""
+        reader = User.objects.create_user(username='Reader')
+        Follow.objects.create(user=reader, author=self.user1)
+        reader_client = Client()
+        reader_client.force_login(reader)
+        reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(card_stats(), {'hits': 0, 'misses': 1})
+        reader_client.get(reverse('posts:follow_index'))
+        self.assertEqual(card_stats(), {'hits': 1, 'misses': 1})
+
+    def test_post_edit_bumps_card_version(self):
+        """Правка поста сразу видна в карточке."""
+        self.authorized_client1.get(self.url)
+        self.authorized_client1.post(
+            reverse('posts:post_edit', kwargs={'post_id': self.post1.id}),
+            data={'text': 'Новый текст', 'group': self.group1.id})
+        response = self.authorized_client1.get(self.url)
+        self.assertContains(response, 'Новый текст')
+        self.assertEqual(card_stats()['misses'], 2)
+
+    def test_author_rename_bumps_card_version(self):
+        """Новое имя автора сразу видно в карточках его постов."""
+        self.authorized_client1.get(self.url)
+        self.user1.last_name = 'Новофамильный'
+        self.user1.save()
+        response = self.authorized_client1.get(self.url)
+        self.assertContains(response, 'Автор: Имя Новофамильный')
+
+    def test_user_save_without_card_changes_keeps_cache(self):
+        """Сохранение пользователя без правки имени (например, вход)
+        не сбрасывает карточки и ленты.
+        """
+        self.authorized_client1.get(self.url)
+        keys = [
+            f'post_card_version:author:{self.user1.pk}',
+            'feed_generation:site:',
+        ]
+        versions = cache.get_many(keys)
+        user = User.objects.get(pk=self.user1.pk)
+        user.last_login = timezone.now()
+        user.save()
+        self.assertEqual(cache.get_many(keys), versions)
+
+    def test_group_slug_change_bumps_card_version(self):
+        """Новый адрес группы сразу виден в карточках её постов."""
+        self.authorized_client1.get(self.url)
+        self.group1.slug = 'new-slug'
+        self.group1.save()
+        response = self.authorized_client1.get(self.url)
+        self.assertContains(response, '/group/new-slug/')
+
+
+class PostCardCommitTests(TransactionTestCase):
+
+    def test_card_rendered_before_commit_is_dropped(self):
+        """Карточка, отрисованная до фиксации правки, после неё не
+        отдаётся из кэша.
+        """
+        author = User.objects.create_user(username='Author')
+        post = Post.objects.create(author=author, text='Старый текст')
+        url = reverse('posts:profile', kwargs={'username': 'Author'})
+        cache.clear()
+        with transaction.atomic():
+            post.text = 'Новый текст'
+            post.save()
+            # Параллельный запрос кладёт карточку под новую версию.
+            self.client.get(url)
+        self.assertEqual(card_stats()['misses'], 1)
+        response = self.client.get(url)
+        self.assertContains(response, 'Новый текст')
+        self.assertEqual(card_stats()['misses'], 2)
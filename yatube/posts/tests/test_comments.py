@@ -0,0 +1,74 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Post
+
+User = get_user_model()
+
+
+@override_settings(COMMENTS_PER_PAGE=3)
+class PostCommentsTests(TestCase):
+    """Комментарии поста выводятся порциями по курсору."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.post = Post.objects.create(author=cls.author, text='Текст')
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.post,
+                author=User.objects.create_user(username=f'Reader{i}'),
+                text=f'Комментарий {i}',
+            )
+            for i in range(7)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_first_batch_inline(self):
+        """На странице поста только первая порция комментариев."""
+        response = self.client.get(
+            reverse('posts:post_detail', kwargs={'post_id': self.post.pk}))
+        comments = response.context['comments']
+        self.assertEqual(
+            [comment.pk for comment in comments],
+            [comment.pk for comment in self.comments[:-4:-1]])
+        self.assertContains(
+            response,
+            reverse('posts:post_comments', kwargs={'post_id': self.post.pk}))
+        self.assertNotContains(response, 'Комментарий 0')
+
+    def test_fragments(self):
+        """Фрагменты отдают следующие порции одним запросом с авторами."""
+        url = reverse('posts:post_comments', kwargs={'post_id': self.post.pk})
+        response = self.client.get(url)
+        self.assertTemplateUsed(response, 'posts/includes/comments.html')
+        self.assertNotContains(response, '<html')
+        seen = []
+        cursor = None
+        while True:
+            params = {'after': cursor} if cursor else {}
+            response = self.client.get(url, params)
+            comments = response.context['comments']
+            seen.extend(comment.pk for comment in comments)
+            cursor = comments.next_cursor
+            if cursor is None:
+                break
+        self.assertEqual(
+            seen, [comment.pk for comment in reversed(self.comments)])
+        cache.clear()
+        # Состояние поста, сам пост и комментарии с авторами.
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+            self.assertContains(response, 'Reader6')
+
+    def test_missing_post(self):
+        """Фрагмент несуществующего поста - 404."""
+        response = self.client.get(
+            reverse('posts:post_comments', kwargs={'post_id': 999}))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,84 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+
+from ..models import Comment, Post
+
+User = get_user_model()
+
+
+class PostDetailConditionalTests(TestCase):
+    """Страница поста отвечает 304, пока пост и комментарии не менялись."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+
+    def setUp(self):
+        cache.clear()
+        self.post = Post.objects.create(author=self.author, text='Текст')
+        self.url = reverse(
+            'posts:post_detail', kwargs={'post_id': self.post.pk})
+        self.client = Client()
+
+    def revalidate(self, response, client=None):
+        return (client or self.client).get(
+            self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+
+    def test_not_modified(self):
+        """Повторный запрос получает 304 одним запросом состояния."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(1):
+            cached = self.revalidate(response)
+        self.assertEqual(cached.status_code, 304)
+
+    def test_changes_reset_etag(self):
+        """Правка поста и комментарии меняют ETag."""
+        response = self.client.get(self.url)
+        self.post.text = 'Новый текст'
+        self.post.save()
+        response = self.client.get(
+            self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        comment = Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий')
+        response = self.client.get(
+            self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        comment.delete()
+        self.assertEqual(self.revalidate(response).status_code, 200)
+
+    def test_etag_depends_on_user(self):
+        """Авторизованный посетитель не получает страницу гостя."""
+        response = self.client.get(self.url)
+        reader_client = Client()
+        reader_client.force_login(self.reader)
+        self.assertEqual(
+            self.revalidate(response, reader_client).status_code, 200)
+
+    def test_dates(self):
+        """updated растёт при правке, commented - при комментарии."""
+        created = self.post.updated
+        self.post.text = 'Правка'
+        self.post.save()
+        self.post.refresh_from_db()
+        self.assertGreater(self.post.updated, created)
+        self.assertIsNone(self.post.commented)
+        comment = Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.commented, comment.created)
+        Post.objects.filter(pk=self.post.pk).update(
+            updated=timezone.now() - timedelta(days=1))
+        self.assertEqual(
+            self.client.get(self.url)['Last-Modified'],
+            http_date(comment.created.timestamp()))
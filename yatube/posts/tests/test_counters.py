@@ -0,0 +1,124 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..forms import PostForm
+from ..models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+        cls.group1 = Group.objects.create(
+            title='Тестовая группа1',
+            slug='test-slug1',
+            description='Тестовое описание1',
+        )
+        cls.group2 = Group.objects.create(
+            title='Тестовая группа2',
+            slug='test-slug2',
+            description='Тестовое описание2',
+        )
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_post_counters(self):
+        """Счётчики постов автора и группы следуют за постами."""
+        post = Post.objects.create(
+            author=self.author, text='Тестовый текст', group=self.group1)
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(Group.objects.get(pk=self.group1.pk).posts_count, 1)
+        self.author_client.post(
+            reverse('posts:post_edit', kwargs={'post_id': post.id}),
+            data={'text': 'Тестовый текст', 'group': self.group2.id})
+        self.assertEqual(Group.objects.get(pk=self.group1.pk).posts_count, 0)
+        self.assertEqual(Group.objects.get(pk=self.group2.pk).posts_count, 1)
+        Post.objects.get(pk=post.pk).delete()
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+        self.assertEqual(Group.objects.get(pk=self.group2.pk).posts_count, 0)
+
+    def test_edit_keeps_counters_changed_after_load(self):
+        """Правка поста и группы не затирает счётчики, сдвинутые после
+        загрузки объекта.
+        """
+        post = Post.objects.create(
+            author=self.author, text='Тестовый текст', group=self.group1)
+        post = Post.objects.get(pk=post.pk)
+        group = Group.objects.get(pk=self.group1.pk)
+        Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий')
+        Post.objects.create(
+            author=self.author, text='Второй пост', group=self.group1)
+        form = PostForm(
+            {'text': 'Новый текст', 'group': self.group1.id}, instance=post)
+        form.save()
+        group.description = 'Новое описание'
+        group.save()
+        post = Post.objects.get(pk=post.pk)
+        self.assertEqual(post.text, 'Новый текст')
+        self.assertEqual(post.comments_count, 1)
+        self.assertIsNotNone(post.commented)
+        self.assertEqual(Group.objects.get(pk=group.pk).posts_count, 2)
+
+    def test_comment_and_follow_counters(self):
+        """Счётчики комментариев и подписок следуют за записями."""
+        post = Post.objects.create(author=self.author, text='Тестовый текст')
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий')
+        self.assertEqual(Post.objects.get(pk=post.pk).comments_count, 1)
+        comment.delete()
+        self.assertEqual(Post.objects.get(pk=post.pk).comments_count, 0)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.reader).following_count, 1)
+        Follow.objects.filter(user=self.reader).delete()
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.reader).following_count, 0)
+
+    def test_commented_matches_recount(self):
+        """После удаления комментария commented - дата последнего
+        оставшегося, как и после пересчёта.
+        """
+        post = Post.objects.create(author=self.author, text='Тестовый текст')
+        first, last = (
+            Comment.objects.create(post=post, author=self.reader, text=text)
+            for text in ('Первый', 'Второй')
+        )
+        for comment, commented in ((last, first.created), (first, None)):
+            comment.delete()
+            post.refresh_from_db()
+            self.assertEqual(post.commented, commented)
+            call_command('recount', stdout=StringIO())
+            post.refresh_from_db()
+            self.assertEqual(post.commented, commented)
+
+    def test_recount_repairs_drift(self):
+        """Команда recount исправляет разошедшиеся счётчики."""
+        Post.objects.bulk_create([
+            Post(author=self.author, text='Пост без сигналов',
+                 group=self.group1),
+        ])
+        UserStats.objects.filter(user=self.reader).delete()
+        call_command('recount', stdout=StringIO())
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.reader).posts_count, 0)
+        self.assertEqual(Group.objects.get(pk=self.group1.pk).posts_count, 1)
+
+    def test_profile_uses_counters(self):
+        """Профиль берёт количество постов из счётчика."""
+        Post.objects.create(author=self.author, text='Тестовый текст')
+        response = self.author_client.get(
+            reverse('posts:profile', kwargs={'username': 'Author'}))
+        self.assertEqual(response.context['posts_count'], 1)
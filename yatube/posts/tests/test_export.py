@@ -0,0 +1,85 @@
+import csv
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ExportTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='leo', first_name='Лев')
+        cls.reader = User.objects.create_user(username='anna')
+        cls.group = Group.objects.create(
+            title='Коты', slug='cats', description='Про котов')
+        cls.old = Post.objects.create(
+            author=cls.author, text='Старый пост', group=cls.group)
+        cls.new = Post.objects.create(author=cls.author, text='Новый пост')
+        Post.objects.filter(pk=cls.old.pk).update(
+            created=datetime(2020, 1, 1, tzinfo=timezone.utc))
+        Comment.objects.create(
+            post=cls.new, author=cls.reader, text='Комментарий')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def export(self, *args):
+        stdout = StringIO()
+        call_command('export_yatube', *args, stdout=stdout, stderr=StringIO())
+        return stdout.getvalue()
+
+    def test_ndjson_round_trip(self):
+        """Выгрузку NDJSON можно загрузить обратно через import_yatube."""
+        path = os.path.join(self.directory, 'dump.ndjson.gz')
+        self.export(path)
+        with gzip.open(path, 'rt', encoding='utf-8') as file:
+            records = [json.loads(line) for line in file]
+        self.assertEqual(
+            [record['model'] for record in records],
+            ['user', 'user', 'group', 'post', 'post', 'comment', 'follow'])
+        Post.objects.all().delete()
+        call_command('import_yatube', path, stdout=StringIO())
+        old = Post.objects.get(pk=self.old.pk)
+        self.assertEqual(old.group, self.group)
+        self.assertEqual(
+            old.created, datetime(2020, 1, 1, tzinfo=timezone.utc))
+        self.assertEqual(Comment.objects.get().post_id, self.new.pk)
+
+    def test_since_limits_dated_models(self):
+        """--since отбирает только новые посты и комментарии."""
+        output = self.export('-', '--since', '2021-01-01')
+        posts = [
+            json.loads(line) for line in output.splitlines()
+            if '"model": "post"' in line
+        ]
+        self.assertEqual([post['id'] for post in posts], [self.new.pk])
+        self.assertIn('"model": "group"', output)
+
+    def test_csv_per_model(self):
+        """CSV пишется отдельным файлом на каждую модель."""
+        self.export(self.directory, '--format', 'csv',
+                    '--models', 'post', 'follow')
+        self.assertEqual(
+            sorted(os.listdir(self.directory)), ['follow.csv', 'post.csv'])
+        with open(os.path.join(self.directory, 'post.csv')) as file:
+            rows = list(csv.DictReader(file))
+        self.assertEqual(rows[0]['group'], 'cats')
+        self.assertEqual(rows[1]['group'], '')
@@ -0,0 +1,77 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Follow, Group, Post
+
+User = get_user_model()
+
+
+class HolesTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание')
+        cls.post = Post.objects.create(
+            author=cls.author,
+            group=cls.group,
+            text='Пост <!--hole:user_nav-->',
+        )
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.author)
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_one_copy_for_everyone(self):
+        """Вошедшие и анонимы получают одну копию страницы из кэша."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': 'group'}),
+            reverse('posts:profile', kwargs={'username': 'Author'}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                anonymous = self.client.get(url)
+                self.assertTemplateUsed(anonymous, 'base.html')
+                self.assertContains(anonymous, 'Войти')
+                response = self.reader_client.get(url)
+                self.assertTemplateNotUsed(response, 'base.html')
+                self.assertContains(response, 'Пользователь: Reader')
+                self.assertNotContains(response, 'Войти')
+                self.assertIn('Cookie', response['Vary'])
+
+    def test_switcher_only_for_users(self):
+        """Вкладки лент видят только вошедшие."""
+        url = reverse('posts:index')
+        self.assertNotContains(self.client.get(url), 'Избранные авторы')
+        self.assertContains(self.reader_client.get(url), 'Избранные авторы')
+
+    def test_follow_button_per_visitor(self):
+        """Кнопка подписки в общей копии профиля своя у каждого."""
+        url = reverse('posts:profile', kwargs={'username': 'Author'})
+        self.assertContains(self.client.get(url), 'Подписаться')
+        self.assertContains(self.reader_client.get(url), 'Отписаться')
+        response = self.author_client.get(url)
+        self.assertNotContains(response, 'Подписаться')
+        self.assertNotContains(response, 'Отписаться')
+
+    def test_edit_link_for_author(self):
+        """Ссылку на правку поста видит только автор."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        edit_url = reverse('posts:post_edit', kwargs={'post_id': self.post.id})
+        self.assertContains(self.author_client.get(url), edit_url)
+        self.assertNotContains(self.reader_client.get(url), edit_url)
+
+    def test_post_text_is_not_a_hole(self):
+        """Метка в тексте поста выводится как текст."""
+        response = self.reader_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Пост &lt;!--hole:user_nav--&gt;')
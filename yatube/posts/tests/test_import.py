@@ -0,0 +1,111 @@
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from ..models import Comment, Follow, Group, Post, TimelineEntry, UserStats
+
+User = get_user_model()
+
+RECORDS = [
+    {'model': 'user', 'username': 'leo', 'first_name': 'Лев'},
+    {'model': 'user', 'username': 'anna'},
+    {'model': 'group', 'slug': 'cats', 'title': 'Коты'},
+    {'model': 'post', 'id': 501, 'author': 'leo', 'group': 'cats',
+     'text': 'Первый пост', 'created': '2021-03-01T10:00:00+00:00'},
+    {'model': 'post', 'id': 502, 'author': 'leo',
+     'text': 'Второй пост', 'created': '2021-03-02T10:00:00+00:00'},
+    {'model': 'comment', 'id': 601, 'post': 501, 'author': 'anna',
+     'text': 'Мяу', 'created': '2021-03-01T11:00:00+00:00'},
+    {'model': 'comment', 'post': 999, 'author': 'anna', 'text': 'Мимо'},
+    {'model': 'follow', 'user': 'anna', 'author': 'leo'},
+]
+
+
+class ImportTests(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'dump.ndjson')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, records, path=None, opener=open):
+        with opener(path or self.path, 'wt', encoding='utf-8') as file:
+            for record in records:
+                file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def run_import(self, *args, path=None):
+        stdout = StringIO()
+        call_command('import_yatube', path or self.path, *args, stdout=stdout)
+        return stdout.getvalue()
+
+    def test_import_builds_everything(self):
+        """Импорт создаёт записи и пересчитывает производные данные."""
+        self.write(RECORDS)
+        self.run_import('--chunk-size', '3', '--batch-size', '2')
+        leo = User.objects.get(username='leo')
+        anna = User.objects.get(username='anna')
+        post = Post.objects.get(pk=501)
+        self.assertEqual(post.group, Group.objects.get(slug='cats'))
+        self.assertEqual(
+            post.created, datetime(2021, 3, 1, 10, tzinfo=timezone.utc))
+        comment = Comment.objects.get()
+        self.assertEqual(comment.post, post)
+        self.assertEqual(
+            comment.created, datetime(2021, 3, 1, 11, tzinfo=timezone.utc))
+        self.assertEqual(post.updated, post.created)
+        self.assertTrue(Follow.objects.filter(user=anna, author=leo).exists())
+        self.assertEqual(UserStats.objects.get(user=leo).posts_count, 2)
+        self.assertEqual(Post.objects.get(pk=501).comments_count, 1)
+        self.assertEqual(TimelineEntry.objects.filter(user=anna).count(), 2)
+        self.assertEqual(list(Post.objects.search('второй')), [
+            Post.objects.get(pk=502)])
+
+    def test_repeated_import_is_idempotent_for_keys(self):
+        """Повторный импорт не дублирует записи с ключами."""
+        self.write(RECORDS)
+        self.run_import()
+        self.run_import()
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(Comment.objects.count(), 1)
+        self.assertEqual(Post.objects.get(pk=501).comments_count, 1)
+        self.assertEqual(Group.objects.count(), 1)
+        self.assertEqual(Follow.objects.count(), 1)
+
+    def test_repeated_import_reports_skipped(self):
+        """Повторный импорт считает записи пропущенными."""
+        self.write(RECORDS)
+        self.run_import()
+        output = self.run_import().splitlines()
+        for model in ('user', 'group', 'post', 'comment', 'follow'):
+            self.assertIn(f'{model}: 0', output)
+        self.assertIn(f'skipped: {len(RECORDS)}', output)
+
+    def test_resume_from_checkpoint(self):
+        """--resume продолжает импорт с сохранённого смещения."""
+        self.write(RECORDS[:4])
+        offset = os.path.getsize(self.path)
+        self.write(RECORDS)
+        with open(f'{self.path}.checkpoint', 'w') as file:
+            json.dump({'offset': offset}, file)
+        User.objects.create_user(username='leo')
+        User.objects.create_user(username='anna')
+        self.run_import('--resume')
+        self.assertEqual(list(Post.objects.values_list('pk', flat=True)),
+                         [502])
+
+    def test_gzip_input(self):
+        """Сжатый файл читается так же."""
+        path = f'{self.path}.gz'
+        self.write(RECORDS, path, gzip.open)
+        self.run_import(path=path)
+        self.assertEqual(Post.objects.count(), 2)
@@ -0,0 +1,114 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class QueryBudgetTests(TestCase):
+    """Страницы укладываются в бюджет SQL-запросов при любом числе постов.
+
+    Бюджет включает два запроса middleware (сессия и пользователь).
+    Посты и комментарии в фикстуре принадлежат разным авторам и группам,
+    поэтому любой N+1 в шаблоне сразу выходит за бюджет.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+        for number in range(10):
+            author = User.objects.create_user(
+                username=f'Author{number}',
+                first_name='Имя',
+                last_name=f'Фамилия{number}',
+            )
+            group = Group.objects.create(
+                title=f'Группа{number}',
+                slug=f'group-{number}',
+                description='Описание',
+            )
+            post = Post.objects.create(
+                author=author,
+                group=group,
+                text=f'Тестовый текст{number}',
+            )
+            Follow.objects.create(user=cls.reader, author=author)
+            Comment.objects.create(
+                post=post, author=author, text='Комментарий')
+        cls.post = post
+        cls.group = Group.objects.create(
+            title='Общая группа',
+            slug='common',
+            description='Описание',
+        )
+        cls.author = User.objects.create_user(username='Prolific')
+        Post.objects.bulk_create(
+            Post(author=cls.author, group=cls.group, text=f'Пост {number}')
+            for number in range(15)
+        )
+        for number in range(10):
+            Comment.objects.create(
+                post=cls.post,
+                author=User.objects.get(username=f'Author{number}'),
+                text=f'Комментарий {number}',
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def assertQueryBudget(self, url, budget, client=None):
+        client = client or self.reader_client
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertEqual(response.status_code, 200)
+        executed = '\n'.join(query['sql'] for query in queries)
+        self.assertLessEqual(
+            len(queries), budget,
+            f'{url}: {len(queries)} запросов при бюджете {budget}\n'
+            f'{executed}'
+        )
+
+    def test_pages_fit_query_budget(self):
+        """Ни одна страница не выходит за свой бюджет запросов."""
+        budgets = {
+            reverse('posts:index'): 3,
+            reverse('posts:group_list', kwargs={'slug': 'common'}): 4,
+            reverse('posts:profile', kwargs={'username': 'Prolific'}): 5,
+            # Плюс запрос состояния поста для ETag.
+            reverse('posts:post_detail', kwargs={'post_id': self.post.id}): 5,
+            reverse('posts:follow_index'): 3,
+        }
+        for url, budget in budgets.items():
+            with self.subTest(url=url):
+                self.assertQueryBudget(url, budget)
+
+    def test_cached_session_and_user(self):
+        """Боевые сессии и пользователь из кэша экономят оба запроса
+        middleware.
+        """
+        production = override_settings(
+            SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+            AUTHENTICATION_BACKENDS=['core.auth.CachedModelBackend'],
+        )
+        budgets = {
+            # Страница из кэша: ни одного запроса.
+            reverse('posts:index'): 0,
+            reverse('posts:follow_index'): 1,
+        }
+        for url, budget in budgets.items():
+            with self.subTest(url=url):
+                self.reader_client.get(url)
+                self.assertQueryBudget(url, budget + 2)
+                with production:
+                    client = Client()
+                    client.force_login(self.reader)
+                    client.get(url)
+                    self.assertQueryBudget(url, budget, client)
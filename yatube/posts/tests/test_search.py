@@ -0,0 +1,98 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from ..models import Group, Post
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.other = User.objects.create_user(username='Other')
+        cls.admin = User.objects.create_superuser(
+            username='Admin', email='admin@example.com', password='pass')
+        cls.group = Group.objects.create(
+            title='Тестовая группа',
+            slug='test-slug',
+            description='Тестовое описание',
+        )
+        cls.url = reverse('posts:search')
+
+    def setUp(self):
+        self.client = Client()
+
+    def found(self, **params):
+        response = self.client.get(self.url, params)
+        return [post.pk for post in response.context['page_obj']]
+
+    def test_index_follows_posts(self):
+        """Индекс обновляется при создании, правке и удалении поста."""
+        post = Post.objects.create(author=self.author, text='Первый снег')
+        self.assertEqual(self.found(q='СНЕГ'), [post.pk])
+        Post.objects.filter(pk=post.pk).update(text='Весенний дождь')
+        self.assertEqual(self.found(q='снег'), [])
+        self.assertEqual(self.found(q='дождь'), [post.pk])
+        post.delete()
+        self.assertEqual(self.found(q='дождь'), [])
+
+    def test_results_are_ranked(self):
+        """Более релевантный пост стоит выше."""
+        rare = Post.objects.create(author=self.author, text='кот и пёс')
+        often = Post.objects.create(author=self.author, text='кот кот кот')
+        self.assertEqual(self.found(q='кот'), [often.pk, rare.pk])
+
+    def test_filters_and_operators(self):
+        """Отбор по группе и автору; операторы FTS5 не ломают запрос."""
+        in_group = Post.objects.create(
+            author=self.author, text='Новости дня', group=self.group)
+        other = Post.objects.create(author=self.other, text='Новости дня')
+        self.assertEqual(
+            self.found(q='новости', group='test-slug'), [in_group.pk])
+        self.assertEqual(self.found(q='новости', author='Other'), [other.pk])
+        self.assertEqual(self.found(q='новости" OR "*'), [])
+
+    def test_cursor_pages_keep_query(self):
+        """Страницы результатов идут по курсору и сохраняют запрос."""
+        posts = [
+            Post.objects.create(author=self.author, text='море ' * (i + 1))
+            for i in range(13)
+        ]
+        response = self.client.get(self.url, {'q': 'море'})
+        page = response.context['page_obj']
+        self.assertEqual(len(page), 10)
+        self.assertContains(response, '?q=%D0%BC%D0%BE%D1%80%D0%B5&after=')
+        second = self.client.get(
+            self.url, {'q': 'море', 'after': page.next_cursor})
+        found = [post.pk for post in page] + [
+            post.pk for post in second.context['page_obj']]
+        self.assertCountEqual(found, [post.pk for post in posts])
+
+    def test_rebuild_command(self):
+        """Команда rebuild_search восстанавливает испорченный индекс."""
+        post = Post.objects.create(author=self.author, text='Горное озеро')
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO posts_post_search(posts_post_search) "
+                "VALUES ('delete-all')")
+        self.assertEqual(self.found(q='озеро'), [])
+        call_command('rebuild_search', stdout=StringIO())
+        self.assertEqual(self.found(q='озеро'), [post.pk])
+
+    def test_admin_search_uses_index(self):
+        """Поиск в админке находит посты через индекс."""
+        post = Post.objects.create(author=self.author, text='Лесная тропа')
+        Post.objects.create(author=self.author, text='Городская улица')
+        self.client.force_login(self.admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'тропа'})
+        self.assertEqual(
+            [row.pk for row in response.context['cl'].result_list], [post.pk])
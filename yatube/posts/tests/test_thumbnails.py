@@ -0,0 +1,156 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from sorl.thumbnail import default
+
+from .. import thumbnails
+from ..models import Follow, Post
+from ..signals import image_ready
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (b'\x47\x49\x46\x38\x39\x61\x02\x00'
+             b'\x01\x00\x80\x00\x00\x00\x00\x00'
+             b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+             b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+             b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+             b'\x0A\x00\x3B'
+             )
+
+
+def uploaded(name='small.gif'):
+    return SimpleUploadedFile(
+        name=name, content=SMALL_GIF, content_type='image/gif')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailsTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='NoName1')
+        cls.author_client = Client()
+        cls.author_client.force_login(cls.user)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+
+    def thumbnail(self, post):
+        geometry, options = thumbnails.POST_THUMBNAILS[0]
+        return default.backend.find_thumbnail(
+            post.image, geometry, **options)
+
+    @override_settings(THUMBNAIL_WORKERS=2)
+    def test_page_falls_back_to_original(self):
+        """Пока миниатюры нет, страница показывает исходную картинку."""
+        post = Post.objects.create(
+            author=self.user, text='Текст', image=uploaded())
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            response = self.author_client.get(
+                reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        self.assertContains(response, post.image.url)
+        schedule.assert_called_once()
+        name, on_ready = schedule.call_args[0]
+        self.assertEqual(name, post.image.name)
+        # Готовые миниатюры сбрасывают карточку, как после сохранения.
+        self.assertIs(on_ready.func, image_ready)
+        self.assertEqual(on_ready.args, (post, post.image.name))
+        self.assertIsNone(self.thumbnail(post))
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_page_never_generates_inline(self):
+        """Без пула страница не режет картинку в потоке запроса."""
+        post = Post.objects.create(
+            author=self.user, text='Текст', image=uploaded())
+        with mock.patch.object(thumbnails, '_run') as run:
+            with mock.patch.object(thumbnails, 'schedule') as schedule:
+                self.author_client.get(
+                    reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        schedule.assert_not_called()
+        run.assert_not_called()
+
+    def test_generated_thumbnail_is_served(self):
+        """Нарезанная в фоне миниатюра попадает на страницу."""
+        post = Post.objects.create(
+            author=self.user, text='Текст', image=uploaded())
+        on_ready = mock.Mock()
+        thumbnails._run(post.image.name, on_ready)
+        on_ready.assert_called_once_with()
+        thumbnail = self.thumbnail(post)
+        self.assertIsNotNone(thumbnail)
+        response = self.author_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        self.assertContains(response, thumbnail.url)
+
+    def test_save_schedules_new_images_only(self):
+        """Нарезка ставится в очередь только для новой картинки."""
+        with mock.patch.object(thumbnails, 'schedule') as schedule:
+            self.author_client.post(
+                reverse('posts:post_create'),
+                data={'text': 'Текст', 'image': uploaded()})
+            post = Post.objects.get()
+            self.assertEqual(schedule.call_count, 1)
+            self.assertEqual(schedule.call_args[0][0], post.image.name)
+            edit_url = reverse('posts:post_edit', kwargs={'post_id': post.pk})
+            self.author_client.post(edit_url, data={'text': 'Новый текст'})
+            self.assertEqual(schedule.call_count, 1)
+            self.author_client.post(
+                edit_url,
+                data={'text': 'Новый текст', 'image': uploaded('new.gif')})
+            self.assertEqual(schedule.call_count, 2)
+
+    def test_page_reads_thumbnails_in_one_query(self):
+        """Записи о миниатюрах страницы читаются одним запросом."""
+        reader = User.objects.create_user(username='Reader')
+        Follow.objects.create(user=reader, author=self.user)
+        posts = [
+            Post.objects.create(
+                author=self.user, text=f'Текст {i}', image=uploaded())
+            for i in range(3)
+        ]
+        thumbnails.generate(posts[0].image.name)
+        cache.clear()
+        reader_client = Client()
+        reader_client.force_login(reader)
+        with mock.patch.object(thumbnails, 'schedule'):
+            with CaptureQueriesContext(connection) as queries:
+                response = reader_client.get(reverse('posts:follow_index'))
+        kvstore_queries = [
+            query for query in queries.captured_queries
+            if 'thumbnail_kvstore' in query['sql']
+        ]
+        self.assertEqual(len(kvstore_queries), 1)
+        self.assertContains(response, self.thumbnail(posts[0]).url)
+        self.assertContains(response, posts[1].image.url)
+
+    def test_responsive_variants(self):
+        """После нарезки страница выводит варианты картинки в srcset."""
+        post = Post.objects.create(
+            author=self.user, text='Текст', image=uploaded())
+        image_ready(post, post.image.name)
+        post = Post.objects.get(pk=post.pk)
+        image = post.responsive_image
+        self.assertEqual(image['srcset'].count('w,'), 2)
+        response = self.author_client.get(
+            reverse('posts:post_detail', kwargs={'post_id': post.pk}))
+        self.assertContains(response, f'srcset="{image["srcset"]}"')
+        self.assertContains(response, 'loading="lazy"')
+        post.image = uploaded('new.gif')
+        post.save()
+        self.assertEqual(Post.objects.get(pk=post.pk).image_variants, '')
@@ -0,0 +1,87 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .. import timeline
+from ..models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class FollowTimelineTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader_client = Client()
+        cls.reader_client.force_login(cls.reader)
+        cls.old_post = Post.objects.create(
+            author=cls.author,
+            text='Пост до подписки',
+        )
+
+    def timeline_texts(self):
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        return [post.text for post in response.context['page_obj']]
+
+    def test_follow_backfills_and_new_posts_fan_out(self):
+        """Подписка дополняет ленту, новый пост раскладывается по лентам."""
+        self.reader_client.get(reverse('posts:profile_follow',
+                                       kwargs={'username': 'Author'}))
+        self.assertEqual(self.timeline_texts(), ['Пост до подписки'])
+        Post.objects.create(author=self.author, text='Пост после подписки')
+        self.assertEqual(self.timeline_texts(),
+                         ['Пост после подписки', 'Пост до подписки'])
+
+    def test_unfollow_prunes_timeline(self):
+        """Отписка убирает посты автора из ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.reader_client.get(reverse('posts:profile_unfollow',
+                                       kwargs={'username': 'Author'}))
+        self.assertFalse(TimelineEntry.objects.filter(
+            user=self.reader).exists())
+        self.assertEqual(self.timeline_texts(), [])
+
+    @override_settings(FOLLOW_TIMELINE_SIZE=2)
+    def test_timeline_size_is_capped(self):
+        """В ленте хранится не больше FOLLOW_TIMELINE_SIZE постов."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        for number in range(3):
+            Post.objects.create(author=self.author, text=f'Пост {number}')
+        self.assertEqual(self.timeline_texts(), ['Пост 2', 'Пост 1'])
+
+    def test_rebuild_timeline_command(self):
+        """Команда rebuild_timeline восстанавливает ленту по подпискам."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timeline', stdout=StringIO())
+        self.assertEqual(self.timeline_texts(), ['Пост до подписки'])
+
+    @override_settings(FOLLOW_TIMELINE_SIZE=1)
+    def test_fan_out_queries_do_not_grow_with_followers(self):
+        """Раскладка поста обрезает все ленты одним запросом."""
+        def fan_out_queries(post):
+            with CaptureQueriesContext(connection) as queries:
+                timeline.fan_out(post)
+            return len(queries)
+
+        Follow.objects.create(user=self.reader, author=self.author)
+        one_follower = fan_out_queries(
+            Post.objects.create(author=self.author, text='Первый'))
+        for number in range(5):
+            Follow.objects.create(
+                user=User.objects.create_user(username=f'Follower{number}'),
+                author=self.author,
+            )
+        post = Post.objects.create(author=self.author, text='Второй')
+        self.assertEqual(fan_out_queries(post), one_follower)
+        self.assertEqual(
+            TimelineEntry.objects.filter(post=post).count(), 6)
+        self.assertFalse(TimelineEntry.objects.exclude(post=post).exists())
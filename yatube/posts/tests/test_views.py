@@ -1,14 +1,21 @@
 import tempfile
+from unittest import mock
 
+from core.paginator import CursorPaginator
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.core.paginator import InvalidPage
+from django.db import transaction
+from django.http import Http404
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
 from django.urls import reverse
 
-from ..models import Group, Post
+from ..caching import feed_group, feed_key_prefix
+from ..models import Follow, Group, Post
 
 User = get_user_model()
 
@@ -56,6 +63,9 @@ class PostsViewsTests(TestCase):
             image=uploaded,
         )
 
+    def setUp(self):
+        cache.clear()
+
     def test_pages_uses_correct_template(self):
         """VIEW-функции используют соответствующие шаблоны."""
         cache.clear()
@@ -173,21 +183,71 @@ class PostsViewsTests(TestCase):
         self.assertNotEqual(post_group_0, self.group2)
 
     def test_cache_index(self):
-        """Проверка хранения и очищения кэша для index."""
+        """Главная берётся из кэша, пока не появится новый пост."""
         response = self.authorized_client1.get(reverse('posts:index'))
         posts = response.content
+        response_old = self.authorized_client1.get(reverse('posts:index'))
+        # Из кэша берётся страница целиком, заново рисуются только
+        # персональные фрагменты.
+        self.assertTemplateNotUsed(response_old, 'posts/index.html')
+        self.assertEqual(response_old.content, posts)
         Post.objects.create(
             author=self.user1,
             text='Тестовый текст кэш2',
             group=self.group1,
         )
-        response_old = self.authorized_client1.get(reverse('posts:index'))
-        old_posts = response_old.content
-        self.assertEqual(old_posts, posts)
-        cache.clear()
         response_new = self.authorized_client1.get(reverse('posts:index'))
-        new_posts = response_new.content
-        self.assertNotEqual(old_posts, new_posts)
+        self.assertContains(response_new, 'Тестовый текст кэш2')
+
+    def test_cache_group_and_profile(self):
+        """Страницы группы и профиля сбрасываются новым постом автора."""
+        urls = (
+            reverse('posts:group_list', kwargs={'slug': 'test-slug1'}),
+            reverse('posts:profile', kwargs={'username': 'NoName1'}),
+        )
+        for url in urls:
+            self.authorized_client1.get(url)
+            self.assertTemplateNotUsed(
+                self.authorized_client1.get(url), 'base.html')
+        Post.objects.create(
+            author=self.user1,
+            text='Тестовый текст кэш3',
+            group=self.group1,
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.authorized_client1.get(url)
+                self.assertContains(response, 'Тестовый текст кэш3')
+
+    def test_feed_group_cached_with_feed(self):
+        """Группа ленты берётся из кэша, пока лента группы не сменится."""
+        group = feed_group('test-slug1')
+        with self.assertNumQueries(0):
+            self.assertEqual(feed_group('test-slug1'), group)
+        Post.objects.create(
+            author=self.user1,
+            text='Тестовый текст группы',
+            group=self.group1,
+        )
+        self.assertEqual(
+            feed_group('test-slug1').posts_count, group.posts_count + 1)
+        Group.objects.get(pk=self.group1.pk).delete()
+        with self.assertRaises(Http404):
+            feed_group('test-slug1')
+
+    def test_lost_generation_created_once(self):
+        """Вытесненное поколение берётся у процесса, который создал его
+        первым.
+        """
+        cache.clear()
+
+        def other_process_added(key, value, timeout=None):
+            cache.set(key, 42, timeout)
+            return False
+
+        with mock.patch.object(cache, 'add', other_process_added):
+            prefix = feed_key_prefix('index')(None)
+        self.assertEqual(prefix, 'feed:index::42.42')
 
     def test_follow_unfollow_usage(self):
         """Проверка пдописки и отписки от авторов."""
@@ -230,6 +290,19 @@ class PostsViewsTests(TestCase):
                                                         ('posts:follow_index'))
         self.assertNotContains(nofollow_response, self.post1.text)
 
+    def test_repeated_follow_is_single(self):
+        """Повторная подписка не создаёт второй записи."""
+        User.objects.create_user(username='NoName2')
+        url = reverse('posts:profile_follow', kwargs={'username': 'NoName2'})
+        self.authorized_client1.get(url)
+        self.authorized_client1.get(url)
+        self.assertEqual(
+            Follow.objects.filter(
+                user=self.user1, author__username='NoName2'
+            ).count(),
+            1,
+        )
+
 
 class PostsViewsPaginatorTests(TestCase):
 
@@ -259,3 +332,77 @@ class PostsViewsPaginatorTests(TestCase):
             reverse('posts:index') + '?page=2')
         self.assertEqual(Post.objects.count(), 13)
         self.assertEqual(len(response.context['page_obj']), 3)
+
+    def test_cursor_pages_walk_through_all_records(self):
+        """Курсоры after и before ведут по страницам без пропусков."""
+        url = reverse('posts:profile', kwargs={'username': 'NoName3'})
+        first_page = self.authorized_client3.get(url).context['page_obj']
+        self.assertIsNone(first_page.previous_cursor)
+        self.assertIsNotNone(first_page.next_cursor)
+        second_page = self.authorized_client3.get(
+            url, {'after': first_page.next_cursor}).context['page_obj']
+        self.assertEqual(len(second_page), 3)
+        self.assertIsNone(second_page.next_cursor)
+        all_ids = [post.id for post in first_page] + [
+            post.id for post in second_page]
+        expected_ids = list(Post.objects.order_by(
+            '-created', '-id').values_list('id', flat=True))
+        self.assertEqual(all_ids, expected_ids)
+        back_page = self.authorized_client3.get(
+            url, {'before': second_page.previous_cursor}).context['page_obj']
+        self.assertEqual([post.id for post in back_page],
+                         [post.id for post in first_page])
+
+    def test_cursor_page_methods(self):
+        """Страница по курсору знает соседей и не считает записи."""
+        paginator = CursorPaginator(Post.objects.all(), 10)
+        first_page = paginator.get_cursor_page()
+        with self.assertNumQueries(0):
+            self.assertTrue(first_page.has_next())
+            self.assertFalse(first_page.has_previous())
+            self.assertTrue(first_page.has_other_pages())
+            repr(first_page)
+            self.assertIsNone(paginator.num_pages)
+        last_page = paginator.get_cursor_page(after=first_page.next_cursor)
+        self.assertFalse(last_page.has_next())
+        self.assertTrue(last_page.has_previous())
+        for name in (
+            'next_page_number', 'previous_page_number',
+            'start_index', 'end_index',
+        ):
+            with self.subTest(method=name):
+                with self.assertRaises(InvalidPage):
+                    getattr(last_page, name)()
+        self.assertEqual(
+            CursorPaginator(Post.objects.all(), 10).page(1).next_page_number(),
+            2)
+
+    def test_broken_cursor_returns_first_page(self):
+        """Испорченный курсор открывает первую страницу."""
+        url = reverse('posts:profile', kwargs={'username': 'NoName3'})
+        response = self.authorized_client3.get(url, {'after': 'broken'})
+        self.assertEqual(len(response.context['page_obj']), 10)
+        self.assertIsNone(response.context['page_obj'].previous_cursor)
+
+
+class FeedCommitTests(TransactionTestCase):
+    # Поколение ленты меняется ещё раз при фиксации, а TestCase
+    # транзакцию не фиксирует.
+
+    def test_page_cached_before_commit_is_dropped(self):
+        """Страница, закэшированная до фиксации записи, после неё не
+        отдаётся.
+        """
+        author = User.objects.create_user(username='Author')
+        url = reverse('posts:index')
+        cache.clear()
+        self.client.get(url)
+        with transaction.atomic():
+            Post.objects.create(author=author, text='Новый пост')
+            # Параллельный запрос кладёт страницу под новое поколение.
+            self.client.get(url)
+            response = self.client.get(url)
+            self.assertTemplateNotUsed(response, 'posts/index.html')
+        response = self.client.get(url)
+        self.assertTemplateUsed(response, 'posts/index.html')
+        self.assertContains(response, 'Новый пост')
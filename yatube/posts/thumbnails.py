@@ -0,0 +1,209 @@
+"""Миниатюры картинок постов, которые готовятся вне запроса.
+
+Когда пост сохраняется с новой картинкой, её миниатюры режутся
+в фоновом пуле потоков. Бэкенд sorl-thumbnail из этого модуля
+(``settings.THUMBNAIL_BACKEND``) на странице только ищет готовую
+миниатюру; пока её нет, ``{% thumbnail %}`` получает исходную
+картинку, а нарезка ставится в очередь.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend as BaseThumbnailBackend
+from sorl.thumbnail.conf import defaults as default_settings
+from sorl.thumbnail.conf import settings as thumbnail_settings
+from sorl.thumbnail.images import ImageFile, deserialize_image_file
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore as BaseKVStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+logger = logging.getLogger(__name__)
+
+# Миниатюры, которые запрашивают шаблоны постов; должны совпадать
+# с аргументами {% thumbnail %} в posts/includes/post_image.html.
+POST_THUMBNAILS = (
+    ('960x339', {'crop': 'center', 'upscale': True}),
+)
+
+_executor = None
+_executor_lock = threading.Lock()
+# Картинки, нарезка которых уже стоит в очереди.
+_pending = set()
+_worker = threading.local()
+
+
+class ThumbnailBackend(BaseThumbnailBackend):
+    """Бэкенд sorl-thumbnail, который не режет картинки во время запроса."""
+
+    def get_thumbnail(self, file_, geometry_string, **options):
+        if getattr(_worker, 'active', False):
+            return super().get_thumbnail(file_, geometry_string, **options)
+        thumbnail = self.find_thumbnail(file_, geometry_string, **options)
+        if thumbnail is not None:
+            return thumbnail
+        enqueue(file_)
+        return ImageFile(file_)
+
+    def find_thumbnail(self, file_, geometry_string, **options):
+        """Готовая миниатюра из key-value store sorl или None."""
+        thumbnail = self.thumbnail_file(file_, geometry_string, options)
+        prefetched = getattr(file_, '_thumbnails', {})
+        if thumbnail.key in prefetched:
+            return prefetched[thumbnail.key]
+        return default.kvstore.get(thumbnail)
+
+    def thumbnail_file(self, file_, geometry_string, options):
+        """Файл миниатюры с тем же именем, что даёт get_thumbnail()."""
+        source = ImageFile(file_)
+        if thumbnail_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(thumbnail_settings, attr)
+            if value != getattr(default_settings, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+
+class KVStore(BaseKVStore):
+    """Key-value store sorl, который умеет читать записи пачкой."""
+
+    def get_many(self, image_files):
+        """Записи картинок по их ключам; отсутствующие - None."""
+        keys = {add_prefix(image_file.key): image_file.key
+                for image_file in image_files}
+        values = self.cache.get_many(keys)
+        missing = [key for key in keys if key not in values]
+        if missing:
+            found = dict(KVStoreModel.objects.filter(
+                key__in=missing
+            ).values_list('key', 'value'))
+            # Как и sorl, запоминаем в кэше и отсутствие записи.
+            loaded = {key: found.get(key, EMPTY_VALUE) for key in missing}
+            self.cache.set_many(
+                loaded, thumbnail_settings.THUMBNAIL_CACHE_TIMEOUT
+            )
+            values.update(loaded)
+        return {
+            keys[key]: (
+                None if value == EMPTY_VALUE
+                else deserialize_image_file(value)
+            )
+            for key, value in values.items()
+        }
+
+
+def prefetch(posts):
+    """Прочитать записи о миниатюрах страницы постов одним обращением.
+
+    Найденное запоминается в ``post.image``, и ``{% thumbnail %}``
+    этих постов больше не обращается к key-value store.
+    """
+    files = {}
+    for post in posts:
+        # Посту с нарезанными вариантами миниатюра не нужна.
+        if not post.image or post.responsive_image:
+            continue
+        post.image._thumbnails = {}
+        for geometry, options in POST_THUMBNAILS:
+            thumbnail = default.backend.thumbnail_file(
+                post.image, geometry, dict(options)
+            )
+            files.setdefault(thumbnail.key, (thumbnail, []))[1].append(
+                post.image
+            )
+    if not files:
+        return
+    found = default.kvstore.get_many(
+        thumbnail for thumbnail, _ in files.values()
+    )
+    for key, (_, images) in files.items():
+        for image in images:
+            image._thumbnails[key] = found.get(key)
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+        return _executor
+
+
+def generate(name):
+    """Нарезать все миниатюры поста для картинки ``name``."""
+    _worker.active = True
+    try:
+        for geometry, options in POST_THUMBNAILS:
+            default.backend.get_thumbnail(name, geometry, **options)
+    finally:
+        _worker.active = False
+
+
+def _run(name, on_ready):
+    try:
+        generate(name)
+        if on_ready is not None:
+            on_ready()
+    except Exception:
+        logger.exception('Не удалось нарезать миниатюры %s', name)
+    finally:
+        with _executor_lock:
+            _pending.discard(name)
+
+
+def _work(name, on_ready):
+    close_old_connections()
+    try:
+        _run(name, on_ready)
+    finally:
+        close_old_connections()
+
+
+def _submit(name, on_ready):
+    with _executor_lock:
+        if name in _pending:
+            return
+        _pending.add(name)
+    if not settings.THUMBNAIL_WORKERS:
+        # Без пула (тесты) режем сразу в текущем потоке.
+        _run(name, on_ready)
+        return
+    _get_executor().submit(_work, name, on_ready)
+
+
+def enqueue(file_):
+    """Заказать со страницы нарезку картинки, у которой нет миниатюры.
+
+    Страница только ставит картинку в очередь пула и никогда не режет
+    её сама; без пула (``THUMBNAIL_WORKERS = 0``, тесты) нарезки нет.
+    Когда миниатюры готовы, срабатывает тот же ``image_ready``, что и
+    после сохранения поста.
+    """
+    if not settings.THUMBNAIL_WORKERS:
+        return
+    name = ImageFile(file_).name
+    on_ready = None
+    post = getattr(file_, 'instance', None)
+    if post is not None:
+        # signals импортирует этот модуль.
+        from .signals import image_ready
+        on_ready = partial(image_ready, post, name)
+    schedule(name, on_ready)
+
+
+def schedule(name, on_ready=None):
+    """Поставить нарезку в очередь, когда картинка окажется в базе."""
+    if name:
+        transaction.on_commit(lambda: _submit(name, on_ready))
@@ -0,0 +1,102 @@
+"""Материализованная лента подписок (fan-out on write).
+
+Каждому читателю хранится не больше ``settings.FOLLOW_TIMELINE_SIZE``
+последних постов авторов, на которых он подписан. Лишние записи
+удаляет один запрос с оконной функцией (SQLite 3.25+) сразу для всех
+затронутых лент: новый пост автора с тысячами подписчиков не
+превращается в тысячи DELETE внутри транзакции публикации.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+
+from .models import Follow, Post, TimelineEntry
+
+ENTRY_ORDERING = ('-created', '-post_id')
+
+
+def _entries(user_id, posts):
+    return [
+        TimelineEntry(user_id=user_id, post_id=post_id, created=created)
+        for post_id, created in posts
+    ]
+
+
+TRIM_SQL = (
+    'DELETE FROM {entries} WHERE id IN ('
+    'SELECT id FROM ('
+    'SELECT id, ROW_NUMBER() OVER ('
+    'PARTITION BY user_id ORDER BY created DESC, post_id DESC'
+    ') AS position FROM {entries} WHERE user_id IN ({users})'
+    ') WHERE position > %s)'
+)
+
+
+def _trim(users, params):
+    """Удалить записи сверх лимита из лент читателей подзапроса users."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            TRIM_SQL.format(
+                entries=TimelineEntry._meta.db_table, users=users
+            ),
+            [*params, settings.FOLLOW_TIMELINE_SIZE],
+        )
+
+
+def trim(user_id):
+    """Удалить из ленты читателя записи сверх лимита."""
+    _trim('%s', [user_id])
+
+
+def trim_followers(author_id):
+    """Удалить записи сверх лимита из лент всех подписчиков автора."""
+    _trim(
+        f'SELECT user_id FROM {Follow._meta.db_table} WHERE author_id = %s',
+        [author_id],
+    )
+
+
+@transaction.atomic
+def fan_out(post):
+    """Разложить новый пост по лентам подписчиков автора."""
+    follower_ids = list(Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user_id', flat=True))
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post=post, created=post.created)
+            for user_id in follower_ids
+        ],
+        ignore_conflicts=True,
+    )
+    trim_followers(post.author_id)
+
+
+@transaction.atomic
+def backfill(user_id, author_id):
+    """Добавить в ленту читателя последние посты нового автора."""
+    posts = Post.objects.filter(author_id=author_id).order_by(
+        '-created', '-id'
+    ).values_list('id', 'created')[:settings.FOLLOW_TIMELINE_SIZE]
+    TimelineEntry.objects.bulk_create(
+        _entries(user_id, posts), ignore_conflicts=True
+    )
+    trim(user_id)
+
+
+def prune(user_id, author_id):
+    """Убрать из ленты читателя посты автора, от которого он отписался."""
+    TimelineEntry.objects.filter(
+        user_id=user_id, post__author_id=author_id
+    ).delete()
+
+
+@transaction.atomic
+def rebuild(user_id):
+    """Собрать ленту читателя заново по его текущим подпискам."""
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    posts = Post.objects.filter(
+        author__following__user_id=user_id
+    ).order_by('-created', '-id').values_list(
+        'id', 'created'
+    )[:settings.FOLLOW_TIMELINE_SIZE]
+    TimelineEntry.objects.bulk_create(_entries(user_id, posts))
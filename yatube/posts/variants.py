@@ -0,0 +1,89 @@
+"""Адаптивные варианты картинок постов.
+
+Для каждой загруженной картинки режется несколько ширин в рамке
+960x339 (как у миниатюры ленты) во всех форматах, которые умеет
+сохранять Pillow: AVIF и WebP, если они собраны, и всегда JPEG.
+Манифест вариантов хранится в ``Post.image_variants``; шаблон
+выводит его как ``<picture>`` с ``<source type>`` на формат,
+и формат выбирает браузер: HTML страницы не зависит от заголовка
+Accept и по-прежнему кэшируется один на всех.
+"""
+import json
+import os
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+VARIANT_WIDTHS = (320, 640, 960)
+VARIANT_RATIO = 339 / 960
+# Форматы в порядке предпочтения: (MIME-тип, формат Pillow, расширение).
+VARIANT_FORMATS = (
+    ('image/avif', 'AVIF', 'avif'),
+    ('image/webp', 'WEBP', 'webp'),
+    ('image/jpeg', 'JPEG', 'jpg'),
+)
+VARIANT_QUALITY = 80
+
+
+def available_formats():
+    """Форматы, которые умеет сохранять установленный Pillow."""
+    Image.init()
+    return [
+        variant for variant in VARIANT_FORMATS if variant[1] in Image.SAVE
+    ]
+
+
+def build(name, storage=default_storage):
+    """Нарезать варианты картинки ``name`` и вернуть их манифест."""
+    with storage.open(name) as file:
+        image = Image.open(file)
+        image.load()
+    image = image.convert('RGB')
+    stem = os.path.splitext(os.path.basename(name))[0]
+    sources = {}
+    for width in VARIANT_WIDTHS:
+        size = (width, round(width * VARIANT_RATIO))
+        variant = ImageOps.fit(image, size, Image.LANCZOS)
+        for mime, pillow_format, extension in available_formats():
+            buffer = BytesIO()
+            variant.save(buffer, pillow_format, quality=VARIANT_QUALITY)
+            saved = storage.save(
+                f'posts/variants/{stem}-{width}.{extension}',
+                ContentFile(buffer.getvalue()),
+            )
+            sources.setdefault(mime, []).append([width, saved])
+    return {'image': name, 'sources': sources}
+
+
+def dumps(manifest):
+    return json.dumps(manifest, separators=(',', ':'))
+
+
+def responsive_image(post, storage=default_storage):
+    """Данные для ``<picture>`` поста или None, если вариантов ещё нет.
+
+    Манифест, нарезанный для прежней картинки, не используется.
+    """
+    if not post.image or not post.image_variants:
+        return None
+    manifest = json.loads(post.image_variants)
+    if manifest['image'] != post.image.name:
+        return None
+    srcsets = {
+        mime: ', '.join(
+            f'{storage.url(name)} {width}w' for width, name in variants
+        )
+        for mime, variants in manifest['sources'].items()
+    }
+    # JPEG нарезается всегда и уходит в сам <img>.
+    jpeg = manifest['sources']['image/jpeg']
+    return {
+        'sources': [
+            (mime, srcset) for mime, srcset in srcsets.items()
+            if mime != 'image/jpeg'
+        ],
+        'srcset': srcsets['image/jpeg'],
+        'src': storage.url(jpeg[-1][1]),
+    }
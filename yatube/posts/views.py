@@ -1,74 +1,172 @@
+from core.decorators import cache_page, conditional_page
+from core.paginator import CursorPaginator
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
+from django.utils.http import http_date
 
-from .forms import CommentForm, PostForm
-from .models import Comment, Follow, Group, Post, User
+from .caching import (feed_group, feed_key_prefix, post_state,
+                      prefetch_post_cards)
+from .counters import get_stats
+from .forms import CommentForm, PostForm, SearchForm
+from .models import Comment, Follow, Post, TimelineEntry, User
+from .search import SEARCH_ORDERING
+from .timeline import ENTRY_ORDERING
 
 
-def get_paginated_page(request, posts):
-    paginator = Paginator(posts, settings.PAGINATOR_PAGES)
+def get_paginated_page(request, posts, ordering=('-created', '-id')):
+    paginator = CursorPaginator(posts, settings.PAGINATOR_PAGES, ordering)
     page_number = request.GET.get('page')
-    return paginator.get_page(page_number)
+    if page_number is not None:
+        return paginator.get_page(page_number)
+    return paginator.get_cursor_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+
+
+def render_feed(request, template, context):
+    """Отрисовать ленту, взяв готовые карточки постов из кэша."""
+    prefetch_post_cards(context['page_obj'])
+    return render(request, template, context)
 
 
-@cache_page(20, key_prefix='index_page')
+@cache_page(
+    settings.FEED_CACHE_TIMEOUT,
+    key_prefix=feed_key_prefix('index'),
+    early_expiry=1.0,
+)
 def index(request):
     """Главная страница."""
     template = 'posts/index.html'
-    posts = Post.objects.all()
+    posts = Post.objects.for_feed()
     page_obj = get_paginated_page(request, posts)
     context = {
         'posts': posts,
         'page_obj': page_obj,
     }
-    return render(request, template, context)
+    return render_feed(request, template, context)
 
 
+@cache_page(
+    settings.FEED_CACHE_TIMEOUT, key_prefix=feed_key_prefix('group', 'slug')
+)
 def group_posts(request, slug):
     """Cтраница последних записей группы."""
-    group = get_object_or_404(Group, slug=slug)
-    posts = Post.objects.filter(group=group).order_by('-created')
+    group = feed_group(slug)
+    posts = Post.objects.filter(group=group).for_feed()
     page_obj = get_paginated_page(request, posts)
     context = {
         'group': group,
         'posts': posts,
         'page_obj': page_obj,
     }
-    return render(request, 'posts/group_list.html', context)
+    return render_feed(request, 'posts/group_list.html', context)
 
 
+@cache_page(
+    settings.FEED_CACHE_TIMEOUT,
+    key_prefix=feed_key_prefix('profile', 'username'),
+)
 def profile(request, username):
     """Профиль пользователя."""
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all().order_by('-created')
-    posts_count = author.posts.count
-    following = author.following.exists()
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    posts = author.posts.for_feed()
+    stats = get_stats(author)
     context = {
         'author': author,
         'posts': posts,
         'page_obj': get_paginated_page(request, posts),
-        'posts_count': posts_count,
-        'following': following,
+        'posts_count': stats.posts_count,
+        'stats': stats,
     }
-    return render(request, 'posts/profile.html', context)
+    return render_feed(request, 'posts/profile.html', context)
+
+
+def search(request):
+    """Поиск по текстам постов с отбором по группе и автору."""
+    form = SearchForm(request.GET or None)
+    if not form.is_valid():
+        return render(request, 'posts/search.html', {'form': form})
+    posts = Post.objects.search(form.cleaned_data['q']).for_feed()
+    if form.cleaned_data['group']:
+        posts = posts.filter(group=form.cleaned_data['group'])
+    if form.cleaned_data['author']:
+        posts = posts.filter(author__username=form.cleaned_data['author'])
+    # Ссылки паджинатора сохраняют запрос и фильтры.
+    query = request.GET.copy()
+    for name in ('page', 'after', 'before'):
+        query.pop(name, None)
+    context = {
+        'form': form,
+        'page_obj': get_paginated_page(request, posts, SEARCH_ORDERING),
+        'query_string': query.urlencode(),
+    }
+    return render_feed(request, 'posts/search.html', context)
+
+
+def get_comments_page(post_id, after=None):
+    """Порция комментариев поста после курсора, с авторами в том же
+    запросе.
+    """
+    comments = Comment.objects.filter(post_id=post_id).with_author()
+    paginator = CursorPaginator(comments, settings.COMMENTS_PER_PAGE)
+    return paginator.get_cursor_page(after=after)
 
 
+def post_detail_state(request, post_id):
+    """Состояние страницы поста для условного GET.
+
+    Страница зависит и от посетителя: кнопки автора, форма
+    комментария с CSRF-токеном.
+    """
+    state = post_state(post_id)
+    if state is None:
+        return None
+    return '{}:{}:{}'.format(
+        state, request.user.pk, request.META.get('CSRF_COOKIE', '')
+    )
+
+
+@conditional_page(post_detail_state, timeout=settings.FEED_CACHE_TIMEOUT)
 def post_detail(request, post_id):
     """Подробная информация о посте."""
-    post = get_object_or_404(Post, id=post_id)
-    comments = Comment.objects.filter(post=post).order_by('-created')
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'), id=post_id
+    )
+    # Сразу выводится только первая порция, остальные подгружаются
+    # фрагментами post_comments.
+    comments = get_comments_page(post.pk, request.GET.get('comments_after'))
     form = CommentForm()
-    post_count = post.author.posts.count()
+    post_count = get_stats(post.author).posts_count
     context = {
         'post': post,
         'post_count': post_count,
         'comments': comments,
         'form': form,
     }
-    return render(request, 'posts/post_detail.html', context)
+    response = render(request, 'posts/post_detail.html', context)
+    response['Last-Modified'] = http_date(
+        max(filter(None, (post.updated, post.commented))).timestamp()
+    )
+    return response
+
+
+def post_comments_state(request, post_id):
+    return post_state(post_id)
+
+
+@conditional_page(post_comments_state, timeout=settings.FEED_CACHE_TIMEOUT)
+def post_comments(request, post_id):
+    """Следующая порция комментариев поста HTML-фрагментом."""
+    post = get_object_or_404(Post.objects.only('id'), id=post_id)
+    context = {
+        'post': post,
+        'comments': get_comments_page(post.pk, request.GET.get('after')),
+    }
+    return render(request, 'posts/includes/comments.html', context)
 
 
 @login_required
@@ -120,23 +218,22 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    follower = Follow.objects.filter(user=request.user).values_list(
-        'author_id', flat=True
-    )
-    posts = Post.objects.filter(author_id__in=follower)
+    """Лента постов авторов, на которых подписан пользователь."""
+    entries = TimelineEntry.objects.filter(user=request.user).for_feed()
+    page_obj = get_paginated_page(request, entries, ENTRY_ORDERING)
+    page_obj.object_list = [entry.post for entry in page_obj.object_list]
     context = {
-        'page_obj': get_paginated_page(request, posts),
+        'page_obj': page_obj,
         'title': 'Подписки'
     }
-    return render(request, 'posts/follow.html', context)
+    return render_feed(request, 'posts/follow.html', context)
 
 
 @login_required
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
-    follow_obj = Follow.objects.filter(user=request.user, author=author)
-    if request.user != author and not follow_obj.exists():
-        Follow.objects.create(user=request.user, author=author)
+    if request.user != author:
+        Follow.objects.get_or_create(user=request.user, author=author)
     return redirect('posts:follow_index')
 
 
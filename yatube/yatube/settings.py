@@ -31,6 +31,17 @@ ALLOWED_HOSTS = [
     'testserver',
 ]
 
+INTERNAL_IPS = [
+    '127.0.0.1',
+    '::1',
+]
+
+# Метрики /metrics/ видят сотрудники сайта и сборщик, который передаёт
+# заголовок «Authorization: Bearer <METRICS_TOKEN>». Адрес клиента
+# не проверяется: за локальным прокси все запросы приходят с 127.0.0.1.
+# Пустой токен - метрики только для сотрудников.
+METRICS_TOKEN = ''
+
 # Application definition
 
 INSTALLED_APPS = [
@@ -48,11 +59,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.slow_queries.SlowQueryMiddleware',
+    'core.middleware.PrimaryPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.HolesMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -64,7 +79,9 @@ TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Бэкенд Django, который засекает время отрисовки для метрик.
+        'BACKEND': 'core.template_backends.DjangoTemplates',
+        'NAME': 'django',
         'DIRS': [TEMPLATES_DIR],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -88,9 +105,45 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    },
+    # Копия основной базы только для чтения; обновляется командой
+    # sync_replicas. В тестах - зеркало default.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db.replica.sqlite3'),
+        'TEST': {'MIRROR': 'default'},
+    },
 }
 
+# Чтение с реплик (см. core.routers). Реплики включаются списком
+# DATABASE_REPLICAS, например ['replica'], при запущенной команде
+# sync_replicas --interval 5. Пользователи (профили, авторы) - модели
+# приложения auth.
+DATABASE_ROUTERS = ['core.routers.PrimaryReplicaRouter']
+DATABASE_REPLICAS = []
+DATABASE_REPLICA_APPS = ['posts', 'auth']
+# Сколько секунд после записи посетитель читает основную базу; должно
+# быть больше отставания реплик.
+DATABASE_PRIMARY_STICKY = 15
+
+# PRAGMA, которые ставятся на каждое новое соединение SQLite
+# (см. core.sqlite). По умолчанию - настройки SQLite как есть.
+SQLITE_PRAGMAS = {}
+# Боевой профиль SQLite: его включает settings_production, а сравнивает
+# с настройками по умолчанию команда benchmark_concurrency.
+SQLITE_PRODUCTION_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    # Отрицательное значение - размер в КиБ: 64 МиБ кэша страниц.
+    'cache_size': -64000,
+    # Читать файл базы через mmap, до 256 МиБ.
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+# Сколько секунд писатель ждёт блокировку, прежде чем ошибка
+# «database is locked» дойдёт до пользователя.
+SQLITE_PRODUCTION_TIMEOUT = 20
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -137,16 +190,72 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 # Константа количеста элементов на одной странице
 PAGINATOR_PAGES = 10
 
+# Сколько комментариев отдаётся за раз
+COMMENTS_PER_PAGE = 20
+
+# Сколько последних постов хранится в ленте подписок одного читателя
+FOLLOW_TIMELINE_SIZE = 1000
+
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/2.2/howto/static-files/
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Миниатюры режутся после сохранения поста, а не во время запроса
+# страницы. THUMBNAIL_WORKERS - размер фонового пула. 0 ставят только
+# тесты (core.test_runner, conftest.py): нарезка после сохранения идёт
+# сразу после коммита в том же потоке (фоновые потоки не гоняются
+# с удалением временного MEDIA_ROOT), а страницы нарезку не заказывают.
+THUMBNAIL_BACKEND = 'posts.thumbnails.ThumbnailBackend'
+THUMBNAIL_KVSTORE = 'posts.thumbnails.KVStore'
+THUMBNAIL_WORKERS = 2
+
+TEST_RUNNER = 'core.test_runner.TestRunner'
+
+# Двухуровневый кэш (см. core.cache): LRU в памяти процесса перед
+# общим кэшем 'shared'. В память процесса попадают только ключи,
+# значение под которыми не меняется: страницы лент с поколением в ключе,
+# их группы, карточки с версиями, ETag.
+# В settings_production общий уровень - файловый кэш, который видят
+# все процессы.
 CACHES = {
     'default': {
+        'BACKEND': 'core.cache.TwoTierCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'MAX_SIZE': 32 * 1024 * 1024,
+            'LOCAL_KEY_PREFIXES': [
+                'views.decorators.cache.cache_header.feed:',
+                'views.decorators.cache.cache_page.feed:',
+                'feed_group:',
+                'post_card:',
+                'conditional_page:',
+            ],
+        },
+    },
+    'shared': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'LOCATION': 'shared',
+    },
 }
 
+# Сколько секунд хранится страница ленты; новые посты сбрасывают
+# её сразу, через смену поколения в ключе
+FEED_CACHE_TIMEOUT = 60 * 60 * 4
+
+# Сколько секунд хранится отрисованная карточка поста
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Сколько секунд пользователь сессии хранится в кэше, если включён
+# core.auth.CachedModelBackend (см. settings_production)
+AUTH_USER_CACHE_TIMEOUT = 60 * 60
+
+# Журнал медленных запросов к базе: порог в секундах (None - выключен),
+# файл журнала, его размер до ротации и число старых файлов.
+SLOW_QUERY_THRESHOLD = None
+SLOW_QUERY_LOG = os.path.join(BASE_DIR, 'logs', 'slow_queries.log')
+SLOW_QUERY_LOG_SIZE = 1024 * 1024
+SLOW_QUERY_LOG_BACKUPS = 5
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
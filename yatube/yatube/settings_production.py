@@ -0,0 +1,62 @@
+"""Настройки боевого сервера.
+
+Запуск: ``DJANGO_SETTINGS_MODULE=yatube.settings_production``.
+Секретный ключ и адреса сайта берутся из переменных окружения; без
+``DJANGO_SECRET_KEY`` сервер не запустится.
+
+SQLite работает в режиме WAL: читатели не ждут писателя, который
+сохраняет комментарий, а писатель не ждёт читателей. synchronous=NORMAL
+в WAL не теряет согласованность при сбое процесса, а fsync делается
+только при checkpoint. Соединения живут между запросами (CONN_MAX_AGE),
+поэтому PRAGMA ставятся раз на поток, а не на каждый запрос.
+Выигрыш показывает команда ``benchmark_concurrency``.
+
+Сессии читаются из кэша (в базу они пишутся только при изменении),
+пользователь сессии - тоже (``core.auth``): запрос вошедшего
+посетителя не тратит на них ни одного обращения к базе.
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import (
+    ALLOWED_HOSTS, BASE_DIR, CACHES, DATABASES, SQLITE_PRODUCTION_PRAGMAS,
+    SQLITE_PRODUCTION_TIMEOUT,
+)
+
+DEBUG = False
+
+SECRET_KEY = os.environ['DJANGO_SECRET_KEY']
+ALLOWED_HOSTS = os.environ.get(
+    'DJANGO_ALLOWED_HOSTS', ','.join(ALLOWED_HOSTS)
+).split(',')
+METRICS_TOKEN = os.environ.get('DJANGO_METRICS_TOKEN', '')
+
+DATABASES = {
+    alias: {
+        **database,
+        # Соединение переиспользуется запросами потока 10 минут.
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {'timeout': SQLITE_PRODUCTION_TIMEOUT},
+    }
+    for alias, database in DATABASES.items()
+}
+
+SQLITE_PRAGMAS = SQLITE_PRODUCTION_PRAGMAS
+
+# Общий уровень кэша - файлы, общие для всех процессов сервера.
+# В нём лежат сессии и пользователи с хэшами паролей: каталог должен
+# принадлежать пользователю сервера и быть закрыт для остальных
+# (Django создаёт его с правами 0700, не расширяйте их).
+CACHES = {
+    **CACHES,
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get(
+            'DJANGO_CACHE_DIR', os.path.join(BASE_DIR, 'cache')
+        ),
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+AUTHENTICATION_BACKENDS = ['core.auth.CachedModelBackend']
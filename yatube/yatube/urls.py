@@ -1,3 +1,4 @@
+from core.views import metrics_view, slow_queries_view
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib import admin
@@ -27,10 +28,12 @@ urlpatterns = [
     path('group/<slug:slug>/', include('posts.urls', namespace='posts')),
     path('profile/<str:username>/', include('posts.urls', namespace='posts')),
     path('posts/', include('posts.urls', namespace='posts')),
+    path('admin/slow-queries/', slow_queries_view, name='slow_queries'),
     path('admin/', admin.site.urls),
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    path('metrics/', metrics_view, name='metrics'),
 ]
 
 if settings.DEBUG: